@@ -1,29 +1,57 @@
+import os
 from datetime import timedelta
 
 from flask import Flask, jsonify
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from extensions import db
+from cache import response_cache
+from compression import compressor
+from db_engine import init_engine
+import json_provider
+from passwords import password_hasher
+from media import media_store
+from facility_index import facility_index
+import identity
 from routes.admin import admin
 from routes.locations import locations_bp
 from routes.hotels import hotels_bp
 from routes.users import users_bp
 from routes.exec_sql import exec_sql_bp
-from import_data import import_data
+from import_data import backfill_distance_km, import_data
+from availability import ensure_booking_nights, rebuild_booking_nights
+from ratings import rebuild_hotel_ratings
+from schema import upgrade_schema
+from search import ensure_search_index, rebuild_search_index
 from routes.comments import comments_bp
 from routes.hotel_rooms import hotel_rooms_bp
 from routes.booking import booking
 from routes.discount import discount
+from routes.metrics import metrics_bp
+from routes.media import media_bp
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hotel.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///hotel.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = 'jasoidopisdhjqwbmclkqmwlckpqisocuioqp[ojweiouifeojlmelcklecjejcopcjlwcj'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=30)
-db.init_app(app)
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+# Let a fronting proxy (nginx X-Accel / Apache X-Sendfile) stream /media files
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true')
+json_provider.init_app(app)
+init_engine(app)
+response_cache.init_app(app)
+compressor.init_app(app)
+password_hasher.init_app(app)
+media_store.init_app(app)
+facility_index.init_app(app)
 
 bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
+identity.init_app(app, jwt)
 
 
 @jwt.unauthorized_loader
@@ -58,17 +86,46 @@ def custom_revoked_token_response(jwt_header, jwt_payload):
     }), 401
 
 
+@app.cli.command('rebuild-availability')
+def rebuild_availability_command():
+    count = rebuild_booking_nights()
+    print(f"Rebuilt availability index: {count} room-nights")
+
+
+@app.cli.command('rebuild-ratings')
+def rebuild_ratings_command():
+    rebuild_hotel_ratings()
+    print("Rebuilt hotel rating aggregates")
+
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    count = rebuild_search_index()
+    db.session.commit()
+    print(f"Rebuilt search index: {count} hotels")
+
+
 app.register_blueprint(locations_bp, url_prefix='/')
 app.register_blueprint(hotels_bp, url_prefix='/')
 app.register_blueprint(users_bp, url_prefix='/')
 app.register_blueprint(exec_sql_bp, url_prefix='/')
 app.register_blueprint(comments_bp, url_prefix='/')
+app.register_blueprint(hotel_rooms_bp, url_prefix='/')
 app.register_blueprint(admin, url_prefix='/')
 app.register_blueprint(booking, url_prefix='/')
 app.register_blueprint(discount, url_prefix='/')
+app.register_blueprint(metrics_bp, url_prefix='/')
+app.register_blueprint(media_bp, url_prefix='/')
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        added_columns = upgrade_schema()
+        if ('Hotel', 'comment_count') in added_columns:
+            rebuild_hotel_ratings()
+        if ('Hotel', 'distance_km') in added_columns:
+            backfill_distance_km()
+        ensure_search_index()
         import_data(db)
+        ensure_booking_nights()
     app.run(host='0.0.0.0', port=5000, debug=True)
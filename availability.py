@@ -0,0 +1,82 @@
+from datetime import timedelta
+from sqlalchemy import exists, insert
+from extensions import db
+from models import Booking, BookingNight, Hotel_Room
+
+REBUILD_BATCH_SIZE = 10000
+
+
+def stay_nights(check_in, check_out):
+    # Nights occupied by a stay in [check_in, check_out)
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+
+def reserve_nights(booking):
+    # Attach the room-night slots to a new booking so they are written in the same flush
+    booking.nights = [
+        BookingNight(room_id=booking.room_id, night=night)
+        for night in stay_nights(booking.check_in, booking.check_out)
+    ]
+
+
+def _occupied(check_in, check_out):
+    return exists().where(
+        BookingNight.room_id == Hotel_Room.id_hotel_room,
+        BookingNight.night >= check_in,
+        BookingNight.night < check_out
+    )
+
+
+def available_rooms_query(hotel_id, check_in, check_out, room_type=None):
+    # One primary-key range probe per room, independent of the hotel's booking history
+    query = Hotel_Room.query.filter(
+        Hotel_Room.hotel_id == hotel_id,
+        ~_occupied(check_in, check_out)
+    )
+    if room_type:
+        query = query.filter(Hotel_Room.room_type == room_type)
+    return query
+
+
+def is_room_available(room_id, check_in, check_out):
+    taken = db.session.query(BookingNight.room_id).filter(
+        BookingNight.room_id == room_id,
+        BookingNight.night >= check_in,
+        BookingNight.night < check_out
+    ).first()
+    return taken is None
+
+
+def rebuild_booking_nights():
+    # Recreate the index from the Booking table, e.g. for databases created before it existed
+    db.session.query(BookingNight).delete()
+    rows = []
+    total = 0
+    bookings = db.session.query(
+        Booking.id, Booking.room_id, Booking.check_in, Booking.check_out
+    ).order_by(Booking.id).yield_per(REBUILD_BATCH_SIZE)
+    for booking_id, room_id, check_in, check_out in bookings:
+        for night in stay_nights(check_in, check_out):
+            rows.append({'room_id': room_id, 'night': night, 'booking_id': booking_id})
+        if len(rows) >= REBUILD_BATCH_SIZE:
+            total += _insert_nights(rows)
+            rows = []
+    if rows:
+        total += _insert_nights(rows)
+    db.session.commit()
+    return total
+
+
+def _insert_nights(rows):
+    # Overlapping legacy bookings keep the first claim on a night instead of aborting the rebuild
+    db.session.execute(insert(BookingNight).prefix_with('OR IGNORE'), rows)
+    return len(rows)
+
+
+def ensure_booking_nights():
+    # Backfill once when the index table is new but bookings already exist
+    has_nights = db.session.query(BookingNight.room_id).first() is not None
+    has_bookings = db.session.query(Booking.id).first() is not None
+    if has_bookings and not has_nights:
+        count = rebuild_booking_nights()
+        print(f"Rebuilt availability index: {count} room-nights")
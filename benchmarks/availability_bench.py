@@ -0,0 +1,137 @@
+"""Compare the legacy availability query with the room-night index.
+
+Builds a throwaway SQLite database holding millions of historical bookings and
+times `/available-rooms` style lookups both ways:
+
+    python -m benchmarks.availability_bench --bookings 2000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask import Flask
+
+from extensions import db
+from db_engine import init_engine
+from models import Booking, Hotel_Room
+from availability import available_rooms_query, stay_nights
+
+START_DATE = date(2018, 1, 1)
+
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_engine(app)
+    return app
+
+
+def legacy_available_rooms(hotel_id, check_in, check_out):
+    booked_rooms = db.session.query(Booking.room_id).filter(
+        Booking.room_id.in_(
+            db.session.query(Hotel_Room.id_hotel_room).filter(Hotel_Room.hotel_id == hotel_id)
+        ),
+        Booking.check_out > check_in,
+        Booking.check_in < check_out
+    ).distinct()
+    return Hotel_Room.query.filter(
+        Hotel_Room.hotel_id == hotel_id,
+        ~Hotel_Room.id_hotel_room.in_(booked_rooms)
+    ).all()
+
+
+def seed(hotels, rooms_per_hotel, bookings, rng):
+    conn = db.engine.raw_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Locations (id_location, name, country, city) VALUES (1, 'Bench', 'Việt Nam', 'Bench')")
+    cursor.execute("INSERT INTO Users (id, user_name, email, password, point) VALUES (1, 'bench', 'bench@example.com', 'x', 0)")
+    cursor.executemany(
+        "INSERT INTO Hotel (id, hotel_name, new_price, old_price, hotel_star, hotel_rating, address, id_location) "
+        "VALUES (?, ?, 500000, 600000, 3, 8, '', 1)",
+        [(h, f'Hotel {h}') for h in range(1, hotels + 1)]
+    )
+    room_ids = list(range(1, hotels * rooms_per_hotel + 1))
+    cursor.executemany(
+        "INSERT INTO Hotel_Room (id_hotel_room, room_number, room_type, hotel_id) VALUES (?, ?, 'Standard', ?)",
+        [(r, str(r), (r - 1) // rooms_per_hotel + 1) for r in room_ids]
+    )
+
+    # Each room gets a non-overlapping run of past stays so the index stays conflict free
+    per_room = max(1, bookings // len(room_ids))
+    booking_id = 0
+    booking_rows, night_rows = [], []
+    for room_id in room_ids:
+        day = START_DATE + timedelta(days=rng.randint(0, 10))
+        for _ in range(per_room):
+            check_in = day + timedelta(days=rng.randint(0, 4))
+            check_out = check_in + timedelta(days=rng.randint(1, 4))
+            booking_id += 1
+            booking_rows.append((booking_id, room_id, check_in.isoformat(), check_out.isoformat()))
+            night_rows.extend((room_id, night.isoformat(), booking_id) for night in stay_nights(check_in, check_out))
+            day = check_out
+        if len(booking_rows) >= 50000:
+            _flush(cursor, booking_rows, night_rows)
+            booking_rows, night_rows = [], []
+    _flush(cursor, booking_rows, night_rows)
+    conn.commit()
+    conn.close()
+    return booking_id, day
+
+
+def _flush(cursor, booking_rows, night_rows):
+    cursor.executemany(
+        "INSERT INTO Booking (id, room_id, users_id, check_in, check_out, number_of_people, number_of_rooms, "
+        "number_of_children, price) VALUES (?, ?, 1, ?, ?, 2, 1, 0, 0)",
+        booking_rows
+    )
+    cursor.executemany("INSERT INTO Booking_Night (room_id, night, booking_id) VALUES (?, ?, ?)", night_rows)
+
+
+def timed(fn, windows):
+    samples = []
+    for hotel_id, check_in, check_out in windows:
+        started = time.perf_counter()
+        fn(hotel_id, check_in, check_out)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hotels', type=int, default=200)
+    parser.add_argument('--rooms-per-hotel', type=int, default=50)
+    parser.add_argument('--bookings', type=int, default=2000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix='availability_bench_')
+    app = create_app(os.path.join(workdir, 'bench.db'))
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        total, horizon = seed(args.hotels, args.rooms_per_hotel, args.bookings, rng)
+        print(f"Seeded {total} bookings in {time.perf_counter() - started:.1f}s ({workdir})")
+
+        span = (horizon - START_DATE).days
+        windows = []
+        for _ in range(args.queries):
+            check_in = START_DATE + timedelta(days=rng.randint(0, span))
+            windows.append((rng.randint(1, args.hotels), check_in, check_in + timedelta(days=rng.randint(1, 7))))
+
+        for name, fn in (
+                ('legacy NOT IN', legacy_available_rooms),
+                ('room-night index', lambda h, i, o: available_rooms_query(h, i, o).all())):
+            mean, p95 = timed(fn, windows)
+            print(f"{name:>18}: mean {mean:8.2f} ms  p95 {p95:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Hammer `POST /bookings` from many threads and check the results stay consistent.
+
+Every worker books random stays on a small pool of rooms, so most requests collide,
+and spends a limited discount. Afterwards the database is checked for overlapping
+stays, over-redeemed discounts and lost point updates:
+
+    python -m benchmarks.booking_stress --threads 16 --requests 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+import identity
+from extensions import db
+from db_engine import init_engine
+from routes.booking import booking as booking_bp
+
+START_DATE = date(2030, 1, 1)
+
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = 'booking-stress'
+    init_engine(app)
+    jwt = JWTManager(app)
+    identity.init_app(app, jwt)
+    app.register_blueprint(booking_bp)
+    return app
+
+
+def seed(users, rooms, discount_uses):
+    conn = db.engine.raw_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO Locations (id_location, name, country, city) VALUES (1, 'Stress', 'Việt Nam', 'Stress')")
+    cursor.execute(
+        "INSERT INTO Hotel (id, hotel_name, new_price, old_price, hotel_star, hotel_rating, address, id_location) "
+        "VALUES (1, 'Stress Hotel', 500000, 600000, 3, 8, '', 1)"
+    )
+    cursor.executemany(
+        "INSERT INTO Hotel_Room (id_hotel_room, room_number, room_type, hotel_id) VALUES (?, ?, 'Standard', 1)",
+        [(r, str(r)) for r in range(1, rooms + 1)]
+    )
+    cursor.execute(
+        "INSERT INTO Discount (id, discount_name, description, discount_value, point_required) "
+        "VALUES (1, 'Stress', '', 10, 0)"
+    )
+    cursor.executemany(
+        "INSERT INTO Users (id, user_name, email, password, point) VALUES (?, ?, ?, 'x', 0)",
+        [(u, f'user{u}', f'user{u}@example.com') for u in range(1, users + 1)]
+    )
+    cursor.executemany(
+        "INSERT INTO user_discount (id, user_id, discount_id, amount, is_used) VALUES (?, ?, 1, ?, 0)",
+        [(u, u, discount_uses) for u in range(1, users + 1)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def worker(app, tokens, rooms, days, requests, rng, results):
+    client = app.test_client()
+    for _ in range(requests):
+        user_id = rng.randrange(1, len(tokens) + 1)
+        check_in = START_DATE + timedelta(days=rng.randrange(days))
+        payload = {
+            'room_id': rng.randint(1, rooms),
+            'check_in': check_in.isoformat(),
+            'check_out': (check_in + timedelta(days=rng.randint(1, 3))).isoformat(),
+            'number_of_people': 2,
+            'number_of_rooms': 1,
+            'number_of_children': 0
+        }
+        if rng.random() < 0.5:
+            payload['user_discount_id'] = user_id
+        response = client.post('/bookings', json=payload,
+                               headers={'Authorization': f'Bearer {tokens[user_id - 1]}'})
+        results.append(response.status_code)
+
+
+def verify(discount_uses):
+    conn = db.engine.raw_connection()
+    cursor = conn.cursor()
+    problems = []
+    # Overlapping stays: two bookings of the same room covering the same night
+    overlaps = cursor.execute(
+        "SELECT COUNT(*) FROM Booking a JOIN Booking b ON a.room_id = b.room_id AND a.id < b.id "
+        "AND a.check_in < b.check_out AND b.check_in < a.check_out"
+    ).fetchone()[0]
+    if overlaps:
+        problems.append(f'{overlaps} overlapping bookings')
+    lost_points = cursor.execute(
+        "SELECT COUNT(*) FROM Users u WHERE u.point != 10 * "
+        "(SELECT COUNT(*) FROM Booking b WHERE b.users_id = u.id)"
+    ).fetchone()[0]
+    if lost_points:
+        problems.append(f'{lost_points} users with lost point updates')
+    bad_discounts = cursor.execute(
+        "SELECT COUNT(*) FROM user_discount d WHERE d.amount < 0 OR d.amount + "
+        "(SELECT COUNT(*) FROM Booking b WHERE b.user_discount_id = d.id) != ?",
+        (discount_uses,)
+    ).fetchone()[0]
+    if bad_discounts:
+        problems.append(f'{bad_discounts} discounts with wrong remaining uses')
+    bookings = cursor.execute("SELECT COUNT(*) FROM Booking").fetchone()[0]
+    conn.close()
+    return bookings, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000, help='total booking attempts')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--days', type=int, default=60, help='check-in dates are drawn from this many days')
+    parser.add_argument('--discount-uses', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='booking_stress_')
+    app = create_app(os.path.join(workdir, 'stress.db'))
+    with app.app_context():
+        db.create_all()
+        seed(args.users, args.rooms, args.discount_uses)
+        tokens = [
+            create_access_token(identity=f'user{u}@example.com', additional_claims={'uid': u})
+            for u in range(1, args.users + 1)
+        ]
+
+    results = []
+    per_thread = args.requests // args.threads
+    threads = [
+        threading.Thread(target=worker, args=(app, tokens, args.rooms, args.days, per_thread,
+                                              random.Random(args.seed + i), results))
+        for i in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(results)
+    with app.app_context():
+        bookings, problems = verify(args.discount_uses)
+    print(f"{len(results)} attempts in {elapsed:.2f}s with {args.threads} threads ({workdir})")
+    print(f"  requests/s: {len(results) / elapsed:8.1f}")
+    print(f"  bookings/s: {statuses[201] / elapsed:8.1f}")
+    print("  statuses:   " + ', '.join(f'{code}={count}' for code, count in sorted(statuses.items())))
+    if statuses[201] != bookings:
+        problems.append(f'{statuses[201]} bookings acknowledged but {bookings} stored')
+    print("  consistency: " + ('OK' if not problems else 'FAILED - ' + '; '.join(problems)))
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+"""Generate a production-sized synthetic dataset from the crawl in output.json.
+
+The real hotels, their facilities and images are the seeds: each generated hotel is
+a variation of a crawled hotel in the same city (first copy keeps the real record),
+written through import_data.BulkImporter so the search index comes along. Rooms,
+guests, bookings (with their room-night slots) and comments are then fanned out with
+skew: hotel popularity and guest activity follow a Zipf distribution, stays are mostly
+short, and comments follow past stays. Three quarters of the booking window lie before
+today and the rest after it, so benchmarks see both stays to review and future bookings
+that collide with their own. The window moves with the date unless --start pins it; with
+the same arguments, including --start, two runs produce byte-identical databases:
+
+    python -m benchmarks.dataset --database /tmp/large.db --hotels 100000 --rooms 1000000 \\
+        --users 500000 --bookings 10000000 --comments 5000000 --start 2026-01-01
+    python -m benchmarks.run --database /tmp/large.db
+
+Guests are guest<id>@example.com with the password "password".
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import bcrypt
+from flask import Flask
+from sqlalchemy import func, insert, select, update
+
+from db_engine import init_engine
+from extensions import db
+from import_data import BulkImporter, iter_json_array
+from models import Booking, BookingNight, Comment, Hotel, Hotel_Room, Users
+from ratings import rebuild_hotel_ratings
+from reservations import BOOKING_POINTS
+from schema import create_schema
+from search import ensure_search_index
+
+BATCH_SIZE = 20000
+PASSWORD = b'password'
+# A fixed salt keeps the generated database byte-for-byte reproducible
+PASSWORD_SALT = b'syntheticdatasetsalt1e'
+ROOM_TYPES = ['Standard', 'Superior', 'Deluxe', 'Family', 'Suite']
+ROOM_TYPE_WEIGHTS = [40, 25, 20, 10, 5]
+# Nights per stay: mostly one to three
+STAY_LENGTHS = [1, 2, 3, 4, 5, 7, 10, 14]
+STAY_LENGTH_WEIGHTS = [30, 28, 18, 9, 6, 5, 3, 1]
+COMMENTS = ['Phòng sạch sẽ, nhân viên thân thiện.', 'Vị trí thuận tiện, gần trung tâm.', 'Bữa sáng ngon.',
+            'Giá hợp lý so với chất lượng.', 'Phòng hơi nhỏ nhưng ổn.', 'Sẽ quay lại lần sau.',
+            'Wifi yếu, cách âm chưa tốt.', 'Hồ bơi đẹp, view tuyệt vời.']
+
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_engine(app)
+    return app
+
+
+class ZipfSampler:
+    """Draws indexes 0..n-1 with weight 1/rank**skew, ranks shuffled so popularity is not tied to id order."""
+
+    def __init__(self, n, skew, rng):
+        ranks = list(range(1, n + 1))
+        rng.shuffle(ranks)
+        self.weights = [1.0 / rank ** skew for rank in ranks]
+        self.cumulative = list(itertools.accumulate(self.weights))
+        self.rng = rng
+
+    def sample(self):
+        return bisect.bisect(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+def apportion(total, weights):
+    # Integer shares of `total` proportional to `weights` (largest remainder, so the shares sum exactly)
+    scale = sum(weights)
+    exact = [total * weight / scale for weight in weights]
+    shares = [int(value) for value in exact]
+    order = sorted(range(len(weights)), key=lambda i: exact[i] - shares[i], reverse=True)
+    for i in order[:total - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+def apportion_capped(total, weights, cap):
+    # As apportion(), but no share exceeds `cap`; the excess goes to the others by weight
+    shares = [0] * len(weights)
+    open_indexes = list(range(len(weights)))
+    remaining = min(total, cap * len(weights))
+    while remaining and open_indexes:
+        for i, share in zip(open_indexes, apportion(remaining, [weights[i] for i in open_indexes])):
+            shares[i] += share
+        remaining = sum(max(0, share - cap) for share in shares)
+        shares = [min(share, cap) for share in shares]
+        open_indexes = [i for i in open_indexes if shares[i] < cap]
+    return shares
+
+
+class BulkWriter:
+    """Buffers rows per table and writes them as executemany inserts, one transaction per batch."""
+
+    def __init__(self, session, batch_size=BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self.pending = {}
+        self.count = 0
+        self.written = {}
+
+    def add(self, model, row):
+        self.pending.setdefault(model, []).append(row)
+        self.count += 1
+        if self.count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Tables are written in the order they were first added to, so parents precede children
+        for model, rows in self.pending.items():
+            if rows:
+                self.session.execute(insert(model.__table__), rows)
+                self.written[model.__tablename__] = self.written.get(model.__tablename__, 0) + len(rows)
+        self.session.commit()
+        self.pending = {}
+        self.count = 0
+
+
+def next_id(column):
+    return (db.session.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def vary_hotel(seed, copy, rng):
+    # The first copy of a seed is the crawled hotel itself; later copies vary its name, price and rating
+    if copy == 0:
+        return seed
+    hotel = dict(seed, Name=f"{seed['Name']} #{copy + 1}")
+    for key in ('New price', 'Old price'):
+        if seed.get(key):
+            price = int(seed[key].replace(',', ''))
+            hotel[key] = str(int(price * rng.uniform(0.7, 1.3)) // 1000 * 1000)
+    if seed.get('Rating'):
+        rating = float(seed['Rating'].replace(',', '.'))
+        hotel['Rating'] = f'{min(10.0, max(1.0, rating + rng.uniform(-1, 1))):.1f}'
+    facilities = list(seed.get('Facilities') or [])
+    rng.shuffle(facilities)
+    hotel['Facilities'] = facilities[:max(1, len(facilities) - rng.randint(0, 2))]
+    images = list(seed.get('Images') or [])
+    hotel['Images'] = images[:max(1, len(images) - rng.randint(0, 2))] if images else []
+    return hotel
+
+
+def generate_hotels(args, rng):
+    cities = [(location['city'], [hotel for hotel in location['Hotel'] if hotel['Name']])
+              for location in iter_json_array(args.data)]
+    cities = [(city, seeds) for city, seeds in cities if seeds]
+    # Bigger crawled cities get more hotels, with extra skew on top
+    cities.sort(key=lambda item: -len(item[1]))
+    city_sampler = ZipfSampler(len(cities), args.skew / 2, rng)
+    copies = {}
+    importer = BulkImporter(db.session, args.batch_size)
+    first_id = importer.next_hotel_id
+    for _ in range(args.hotels):
+        city, seeds = cities[city_sampler.sample()]
+        seed = rng.choice(seeds)
+        copy = copies.get(seed['Name'], 0)
+        copies[seed['Name']] = copy + 1
+        importer.add_hotel(vary_hotel(seed, copy, rng), importer.location_id(city))
+    importer.flush()
+    return db.session.execute(
+        select(Hotel.id, Hotel.hotel_star, Hotel.hotel_rating, Hotel.new_price)
+        .where(Hotel.id >= first_id).order_by(Hotel.id)).all()
+
+
+def generate_rooms(args, hotels, writer, rng):
+    # Larger hotels at higher star ratings; returns [(room_id, hotel index)]
+    weights = [(1 + (star or 0)) * rng.lognormvariate(0, 0.5) for _, star, _, _ in hotels]
+    room_id = next_id(Hotel_Room.id_hotel_room)
+    rooms = []
+    for index, ((hotel_id, _, _, _), count) in enumerate(zip(hotels, apportion(args.rooms, weights))):
+        for number in range(count):
+            writer.add(Hotel_Room, {
+                'id_hotel_room': room_id,
+                'room_number': f'{number // 20 + 1}{number % 20 + 1:02d}',
+                'room_type': rng.choices(ROOM_TYPES, ROOM_TYPE_WEIGHTS)[0],
+                'hotel_id': hotel_id
+            })
+            rooms.append((room_id, index))
+            room_id += 1
+    writer.flush()
+    return rooms
+
+
+def generate_users(args, writer, rng):
+    password = bcrypt.hashpw(PASSWORD, b'$2b$%02d$' % args.password_rounds + PASSWORD_SALT).decode('ascii')
+    first_id = next_id(Users.id)
+    for user_id in range(first_id, first_id + args.users):
+        birth = date(1960, 1, 1) + timedelta(days=rng.randrange(365 * 45))
+        writer.add(Users, {
+            'id': user_id, 'user_name': f'Guest {user_id}', 'email': f'guest{user_id}@example.com',
+            'password': password, 'country': 'Việt Nam', 'phone_number': f'09{rng.randrange(10 ** 8):08d}',
+            'point': 0, 'date_of_birth': birth
+        })
+    writer.flush()
+    return range(first_id, first_id + args.users)
+
+
+def past_days(days):
+    # Three quarters of the booking window lie before "today", the last quarter after it
+    return days * 3 // 4
+
+
+def generate_stays(args, hotels, rooms, users, writer, rng):
+    start = date.fromisoformat(args.start)
+    today = start + timedelta(days=past_days(args.days))  # the rest of the window is future bookings
+    hotel_sampler = ZipfSampler(len(hotels), args.skew, rng)
+    guest_sampler = ZipfSampler(len(users), args.skew / 2, rng)
+    # Each room's share of bookings follows its hotel's popularity,
+    # capped so the stays still fit in the window with some vacancy between them
+    room_weights = [hotel_sampler.weights[index] for _, index in rooms]
+    mean_stay = sum(n * w for n, w in zip(STAY_LENGTHS, STAY_LENGTH_WEIGHTS)) / sum(STAY_LENGTH_WEIGHTS)
+    per_room = apportion_capped(args.bookings, room_weights, int(args.days * 0.8 / mean_stay))
+    expected_past = args.bookings * 3 / 4
+    comment_rate = min(1.0, args.comments / expected_past) if expected_past else 0.0
+
+    booking_id = next_id(Booking.id)
+    comment_id = next_id(Comment.id_comment)
+    for (room_id, index), count in zip(rooms, per_room):
+        if not count:
+            continue
+        hotel_id, _, hotel_rating, price = hotels[index]
+        # Stays are laid end to end with random gaps, so a room is never double-booked
+        lengths = rng.choices(STAY_LENGTHS, STAY_LENGTH_WEIGHTS, k=count)
+        while sum(lengths) > args.days:
+            lengths.pop()
+        cuts = sorted(rng.randrange(args.days - sum(lengths) + 1) for _ in lengths)
+        position = 0
+        previous_cut = 0
+        for nights, cut in zip(lengths, cuts):
+            position += cut - previous_cut
+            previous_cut = cut
+            check_in = start + timedelta(days=position)
+            check_out = check_in + timedelta(days=nights)
+            position += nights
+            user_id = users[guest_sampler.sample()]
+            booked_at = datetime.combine(check_in - timedelta(days=rng.randint(0, 120)), datetime.min.time()) \
+                + timedelta(seconds=rng.randrange(86400))
+            people = rng.choices([1, 2, 3, 4], [20, 55, 15, 10])[0]
+            writer.add(Booking, {
+                'id': booking_id, 'room_id': room_id, 'users_id': user_id, 'check_in': check_in,
+                'check_out': check_out, 'number_of_people': people, 'number_of_rooms': 1,
+                'number_of_children': rng.choices([0, 1, 2], [70, 20, 10])[0],
+                'price': float(nights * (price or 0)), 'created_at': booked_at
+            })
+            for night in range(nights):
+                writer.add(BookingNight, {'room_id': room_id, 'night': check_in + timedelta(days=night),
+                                          'booking_id': booking_id})
+            if check_out <= today and rng.random() < comment_rate:
+                rating = min(10.0, max(1.0, rng.gauss(hotel_rating or 8.0, 1.2)))
+                writer.add(Comment, {
+                    'id_comment': comment_id, 'rating_point': round(rating, 1), 'comment': rng.choice(COMMENTS),
+                    'user_id': user_id, 'hotel_id': hotel_id,
+                    'created_at': datetime.combine(check_out, datetime.min.time())
+                    + timedelta(days=rng.randint(0, 14), seconds=rng.randrange(86400))
+                })
+                comment_id += 1
+            booking_id += 1
+    writer.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLite file to create or extend')
+    parser.add_argument('--data', default='output.json', help='crawl used as seeds')
+    parser.add_argument('--hotels', type=int, default=2000)
+    parser.add_argument('--rooms', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=50000, help='approximate; comments follow past stays')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for hotel and guest popularity')
+    parser.add_argument('--start', help='first possible check-in (default: three quarters of --days before today)')
+    parser.add_argument('--days', type=int, default=3 * 365, help='length of the booking window')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--password-rounds', type=int, default=12, help='bcrypt cost of the shared guest password')
+    args = parser.parse_args()
+    if args.start is None:
+        args.start = (date.today() - timedelta(days=past_days(args.days))).isoformat()
+
+    rng = random.Random(args.seed)
+    app = create_app(os.path.abspath(args.database))
+    with app.app_context():
+        create_schema()
+        ensure_search_index()
+        writer = BulkWriter(db.session, args.batch_size)
+
+        def step(name, fn, *fn_args):
+            started = time.perf_counter()
+            result = fn(*fn_args)
+            print(f'{name}: {time.perf_counter() - started:.1f}s')
+            return result
+
+        hotels = step('hotels', generate_hotels, args, rng)
+        rooms = step('rooms', generate_rooms, args, hotels, writer, rng)
+        users = step('users', generate_users, args, writer, rng)
+        if rooms and users:
+            step('bookings and comments', generate_stays, args, hotels, rooms, users, writer, rng)
+
+        def finish():
+            rebuild_hotel_ratings()
+            points = select(func.count(Booking.id) * BOOKING_POINTS).where(Booking.users_id == Users.id).scalar_subquery()
+            db.session.execute(update(Users).where(Users.id >= users.start).values(point=points)
+                               .execution_options(synchronize_session=False))
+            db.session.commit()
+
+        step('aggregates', finish)
+        written = dict(writer.written, Hotel=len(hotels))
+        print(', '.join(f'{count} {table}' for table, count in written.items()) + f' rows in {args.database}')
+
+
+if __name__ == '__main__':
+    main()
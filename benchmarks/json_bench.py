@@ -0,0 +1,139 @@
+"""Measure hotel-list serialization throughput in MB/s.
+
+Loads output.json into a throwaway database and builds the unpaged
+`/hotels/location/<id>` payload for every location three ways: the previous ORM
+path (joinedload + stdlib json), the row serializers with the stdlib encoder, and
+the row serializers with the orjson-backed provider. It also times the endpoint
+end to end with each provider:
+
+    python -m benchmarks.json_bench --repeat 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy.orm import joinedload
+
+import json_provider
+from db_engine import init_engine
+from extensions import db
+from import_data import import_data
+from models import Hotel, Locations
+from routes.hotels import hotels_bp
+from search import ensure_search_index
+from serializers import hotel_list_query, serialize_hotel_rows
+
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = 'json-bench-secret-key-for-local-runs'
+    init_engine(app)
+    JWTManager(app)
+    app.register_blueprint(hotels_bp)
+    return app
+
+
+def legacy_payload(location):
+    hotels = Hotel.query.filter_by(id_location=location.id_location).options(
+        joinedload(Hotel.facilities),
+        joinedload(Hotel.images),
+        joinedload(Hotel.location)
+    ).all()
+    return [{
+        'id': hotel.id,
+        'hotel_name': hotel.hotel_name,
+        'new_price': hotel.new_price,
+        'old_price': hotel.old_price,
+        'hotel_star': hotel.hotel_star,
+        'hotel_rating': hotel.hotel_rating,
+        'user_rating': hotel.user_rating,
+        'address': hotel.address,
+        'image': [image.image_url for image in hotel.images],
+        'policies': hotel.policies,
+        'descriptions': hotel.description,
+        'distance': hotel.distance,
+        'distance_km': hotel.distance_km,
+        'location': {
+            'id_location': hotel.location.id_location,
+            'name': hotel.location.name,
+            'city': hotel.location.city,
+            'country': hotel.location.country
+        },
+        'facilities': [facility.name for facility in hotel.facilities]
+    } for hotel in hotels]
+
+
+def row_payload(location):
+    rows = hotel_list_query().filter(Hotel.id_location == location.id_location).all()
+    return serialize_hotel_rows(rows, location)
+
+
+def timed(build, encode, items, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            encode(build(item))
+            db.session.expunge_all()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='output.json')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='json_bench_')
+    app = create_app(os.path.join(workdir, 'bench.db'))
+    stdlib = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+    with app.app_context():
+        db.create_all()
+        ensure_search_index()
+        import_data(db, args.data)
+        locations = Locations.query.all()
+        token = create_access_token(identity='bench@example.com')
+
+        # The row serializers must produce exactly what the ORM path did
+        for location in locations:
+            if json.loads(stdlib.dumps(legacy_payload(location))) != json.loads(fast.dumps(row_payload(location))):
+                raise SystemExit(f'Payload mismatch for location {location.id_location}')
+
+        # Rates are MB of UTF-8 JSON per second; the stdlib encoder's \u escapes are not counted
+        payloads = [row_payload(location) for location in locations]
+        megabytes = sum(len(fast.dump_bytes(payload)) for payload in payloads) * args.repeat / 1e6
+        encoders = {'stdlib json': lambda obj: stdlib.dumps(obj).encode('utf-8'), 'orjson': fast.dump_bytes}
+        print(f"Hotel list payloads for {len(locations)} locations, {megabytes:.1f} MB over {args.repeat} passes ({workdir})")
+        for name, build, encoder in (
+                ('ORM + stdlib json', legacy_payload, 'stdlib json'),
+                ('rows + stdlib json', row_payload, 'stdlib json'),
+                ('rows + orjson', row_payload, 'orjson')):
+            elapsed = timed(build, encoders[encoder], locations, args.repeat)
+            print(f"  {name:>20}: {megabytes / elapsed:8.2f} MB/s  ({elapsed:.2f}s)")
+        for name, encode in encoders.items():
+            elapsed = timed(lambda payload: payload, encode, payloads, args.repeat)
+            print(f"  {name + ' only':>20}: {megabytes / elapsed:8.2f} MB/s  ({elapsed:.2f}s)")
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    for run, (name, provider) in enumerate((('endpoint, stdlib', stdlib), ('endpoint, orjson', fast))):
+        app.json = provider
+        started = time.perf_counter()
+        for n in range(args.repeat):
+            for location in locations:
+                # A query string unique to each request keeps the response cache out of the measurement
+                client.get(f'/hotels/location/{location.id_location}?page={run * args.repeat + n + 1}', headers=headers)
+        elapsed = time.perf_counter() - started
+        per_request = elapsed / (args.repeat * len(locations)) * 1000
+        print(f"  {name:>20}: {megabytes / elapsed:8.2f} MB/s  ({per_request:.2f} ms/request)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compare N `POST /calculate-price` calls with one `POST /calculate-price/batch` call.
+
+Quotes every room of a few hotels over several date windows, the way the search UI
+does, and checks both paths return the same totals:
+
+    python -m benchmarks.quote_bench --rooms 200 --windows 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from benchmarks.booking_stress import create_app, seed
+from extensions import db
+
+START_DATE = date(2030, 1, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--windows', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix='quote_bench_')
+    app = create_app(os.path.join(workdir, 'quote.db'))
+    with app.app_context():
+        db.create_all()
+        seed(1, args.rooms, 5)
+        token = create_access_token(identity='user1@example.com', additional_claims={'uid': 1})
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+
+    items = []
+    for window in range(args.windows):
+        check_in = START_DATE + timedelta(days=rng.randrange(90))
+        check_out = check_in + timedelta(days=rng.randint(1, 7))
+        for room_id in range(1, args.rooms + 1):
+            item = {'key': f'{room_id}:{window}', 'room_id': room_id,
+                    'check_in': check_in.isoformat(), 'check_out': check_out.isoformat()}
+            if rng.random() < 0.5:
+                item['user_discount_id'] = 1
+            items.append(item)
+
+    single_best = batch_best = None
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        single = {}
+        for item in items:
+            payload = {k: v for k, v in item.items() if k != 'key'}
+            single[item['key']] = client.post('/calculate-price', json=payload, headers=headers).get_json()['data']
+        elapsed = time.perf_counter() - started
+        single_best = elapsed if single_best is None else min(single_best, elapsed)
+
+        started = time.perf_counter()
+        batch = client.post('/calculate-price/batch', json={'items': items}, headers=headers).get_json()['data']
+        elapsed = time.perf_counter() - started
+        batch_best = elapsed if batch_best is None else min(batch_best, elapsed)
+
+    mismatches = [key for key in single if single[key]['total_price'] != batch[key]['total_price']]
+    print(f"{len(items)} quotes ({args.rooms} rooms x {args.windows} windows), best of {args.repeat} ({workdir})")
+    print(f"  {len(items)} single calls: {single_best * 1000:9.1f} ms")
+    print(f"  one batch call:   {batch_best * 1000:9.1f} ms  ({single_best / batch_best:.1f}x faster)")
+    print("  totals match: " + ('yes' if not mismatches else f'NO ({len(mismatches)} differ)'))
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,511 @@
+"""Benchmark the API endpoint by endpoint and save the results as JSON.
+
+Drives a mix of requests against every blueprint (hotels, hotel_rooms, booking,
+comments, discount, users, locations, admin) from a pool of client threads, either
+in-process through the Flask test client or over HTTP against a local WSGI server.
+For each scenario it reports throughput, p50/p95/p99 latency and SQL statements per
+request, and writes everything to a JSON file that a later run can be compared with:
+
+    python -m benchmarks.run --concurrency 8 --requests 500
+    python -m benchmarks.run --database hotel.db --scenarios hotels,booking --transport http
+    python -m benchmarks.run --compare benchmarks/results/<earlier run>.json
+
+Without --database the crawl in output.json is loaded into a throwaway database. With
+it, the file is copied first and the run works on the copy: the fixtures and the
+booking, comment and redeem scenarios write rows, which must not end up in a dev or
+generated database and skew the next run against it.
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import quote, urlencode
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+START_DATE = date(2032, 1, 1)
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'bench-password'
+QUERY_COUNT_HEADER = 'X-Bench-Queries'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='existing SQLite file to copy and run against (default: a fresh import of --data)')
+    parser.add_argument('--data', default='output.json')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads per scenario')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per scenario')
+    parser.add_argument('--scenarios', help='comma-separated scenario or blueprint names (default: all)')
+    parser.add_argument('--transport', choices=['wsgi', 'http'], default='wsgi',
+                        help='wsgi: Flask test client in-process; http: a local threaded WSGI server')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier result file to print deltas against')
+    return parser.parse_args()
+
+
+args = parse_args() if __name__ == '__main__' else None
+WORKDIR = tempfile.mkdtemp(prefix='bench_run_')
+
+
+def copy_database(source, target):
+    # The backup API copies a consistent snapshot, including pages still in the -wal file
+    if not os.path.isfile(source):
+        sys.exit(f'No such database: {source}')
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+if args is not None:
+    database = os.path.join(WORKDIR, 'bench.db')
+    if args.database:
+        copy_database(args.database, database)
+    # app.py reads this at import time; assigned so an exported DATABASE_URL cannot redirect the run
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+
+from flask import g, has_app_context  # noqa: E402
+from sqlalchemy import event, func, select  # noqa: E402
+
+from app import app  # noqa: E402
+from cache import response_cache  # noqa: E402
+from extensions import db  # noqa: E402
+from import_data import import_data  # noqa: E402
+from models import Booking, Discount, Hotel, Hotel_Room, Locations, Users  # noqa: E402
+from schema import upgrade_schema  # noqa: E402
+from search import ensure_search_index  # noqa: E402
+
+
+# --- query counting -------------------------------------------------------------------
+# Counted per request on the server side and returned in a header, so both transports
+# report the same thing.
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and 'bench_queries' in g:
+        g.bench_queries += 1
+
+
+def _start_count():
+    g.bench_queries = 0
+
+
+def _report_count(response):
+    response.headers[QUERY_COUNT_HEADER] = str(g.get('bench_queries', 0))
+    return response
+
+
+def instrument(flask_app):
+    with flask_app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _count_query)
+    flask_app.before_request(_start_count)
+    flask_app.after_request(_report_count)
+
+
+# --- transports -----------------------------------------------------------------------
+
+class TestClientTransport:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, url, headers=None, json_body=None, form=None):
+        response = self.client.open(url, method=method, headers=headers, json=json_body, data=form)
+        return response.status_code, int(response.headers.get(QUERY_COUNT_HEADER, 0))
+
+
+class HTTPTransport:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+
+    def request(self, method, url, headers=None, json_body=None, form=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            body = urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            # Scenario URLs carry raw text such as "hồ bơi"; the test client encodes it, http.client does not
+            connection.request(method, quote(url, safe="/?&=:,|%"), body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status, int(response.getheader(QUERY_COUNT_HEADER) or 0)
+        finally:
+            connection.close()
+
+
+def start_server(flask_app):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- dataset --------------------------------------------------------------------------
+
+def prepare_database(load_data):
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        ensure_search_index()
+        if load_data:
+            import_data(db, args.data)
+
+
+def seed_fixtures():
+    # A bench user plus enough rooms and discounts to book against; reused on existing databases
+    client = app.test_client()
+    client.post('/register', data={'user_name': 'bench', 'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+    response = client.post('/login', json={'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+    token = response.get_json()['data']['access_token']
+    with app.app_context():
+        user = Users.query.filter_by(email=BENCH_EMAIL).one()
+        user.point = max(user.point or 0, 10 ** 6)
+        locations = [row[0] for row in db.session.execute(
+            select(Hotel.id_location).group_by(Hotel.id_location).order_by(func.count().desc()).limit(8))]
+        hotels = [row[0] for row in db.session.execute(
+            select(Hotel.id).where(Hotel.id_location.in_(locations)).order_by(Hotel.id).limit(50))]
+        for hotel_id in hotels:
+            if not Hotel_Room.query.filter_by(hotel_id=hotel_id).first():
+                db.session.add_all(Hotel_Room(room_number=str(100 + n), room_type=('Standard', 'Deluxe')[n % 2],
+                                              hotel_id=hotel_id) for n in range(10))
+        if not Discount.query.first():
+            db.session.add(Discount(discount_name='Bench', description='', point_required=0, discount_value=10))
+        db.session.commit()
+        rooms = [row[0] for row in db.session.execute(
+            select(Hotel_Room.id_hotel_room).where(Hotel_Room.hotel_id.in_(hotels)))]
+        discounts = [row[0] for row in db.session.execute(select(Discount.id).limit(5))]
+        first_rooms = dict(db.session.execute(
+            select(Hotel_Room.hotel_id, func.min(Hotel_Room.id_hotel_room)).where(Hotel_Room.hotel_id.in_(hotels))
+            .group_by(Hotel_Room.hotel_id)).all())
+
+    # Only guests with a booking may comment on a hotel
+    for room_id in first_rooms.values():
+        client.post('/bookings', headers={'Authorization': f'Bearer {token}'}, json={
+            'room_id': room_id, 'check_in': '2031-12-30', 'check_out': '2031-12-31',
+            'number_of_people': 1, 'number_of_rooms': 1, 'number_of_children': 0})
+    with app.app_context():
+        user_id = Users.query.filter_by(email=BENCH_EMAIL).one().id
+        booked_hotels = [row[0] for row in db.session.execute(
+            select(Hotel_Room.hotel_id).join(Booking, Booking.room_id == Hotel_Room.id_hotel_room)
+            .where(Booking.users_id == user_id, Hotel_Room.hotel_id.in_(hotels)).distinct())]
+    return {
+        'token': token, 'locations': locations, 'hotels': hotels, 'booked_hotels': booked_hotels,
+        'rooms': rooms, 'discounts': discounts
+    }
+
+
+# --- scenarios ------------------------------------------------------------------------
+# Each scenario builds one request from the fixtures and a random generator:
+# (method, url, options). `expect` lists the statuses that count as success.
+
+def stay(rng, max_nights=4):
+    check_in = START_DATE + timedelta(days=rng.randrange(365 * 3))
+    return check_in.isoformat(), (check_in + timedelta(days=rng.randint(1, max_nights))).isoformat()
+
+
+def build_scenarios(fx):
+    auth = {'Authorization': f"Bearer {fx['token']}"}
+    sorts = ['new_price', 'hotel_star', 'hotel_rating', 'distance', 'hotel_name']
+
+    def hotels_list(rng):
+        return 'GET', f"/hotels/location/{rng.choice(fx['locations'])}", {'headers': auth}
+
+    def hotels_page(rng):
+        return 'GET', (f"/hotels/location/{rng.choice(fx['locations'])}?paging=cursor&per_page=20"
+                       f"&sort_by={rng.choice(sorts)}&sort_order={rng.choice(['asc', 'desc'])}"
+                       f"&fields=id,hotel_name,new_price,hotel_star,user_rating,image"), {'headers': auth}
+
+    def hotels_filter(rng):
+        return 'GET', (f"/hotels/location/{rng.choice(fx['locations'])}?hotel_star_min={rng.randint(1, 4)}"
+                       f"&new_price_max={rng.randint(5, 40) * 100000}&facilities={rng.choice(['wifi', 'hồ bơi', 'bữa sáng'])}"
+                       f"&paging=true&per_page=10"), {'headers': auth}
+
+    def hotels_search(rng):
+        return 'GET', f"/hotels/search?q={rng.choice(['da nang', 'ho boi', 'khach san', 'resort', 'ha noi'])}", \
+            {'headers': auth}
+
+    def hotel_rooms(rng):
+        return 'GET', f"/hotels/{rng.choice(fx['hotels'])}/rooms", {'headers': auth}
+
+    def available_rooms(rng):
+        check_in, check_out = stay(rng)
+        return 'GET', (f"/available-rooms?hotel_id={rng.choice(fx['hotels'])}&check_in={check_in}"
+                       f"&check_out={check_out}"), {'headers': auth}
+
+    def calculate_price(rng):
+        check_in, check_out = stay(rng)
+        return 'POST', '/calculate-price', {'headers': auth, 'json_body': {
+            'room_id': rng.choice(fx['rooms']), 'check_in': check_in, 'check_out': check_out}}
+
+    def create_booking(rng):
+        check_in, check_out = stay(rng, 3)
+        return 'POST', '/bookings', {'headers': auth, 'json_body': {
+            'room_id': rng.choice(fx['rooms']), 'check_in': check_in, 'check_out': check_out,
+            'number_of_people': 2, 'number_of_rooms': 1, 'number_of_children': 0}}
+
+    def booking_history(rng):
+        return 'GET', '/booking-history', {'headers': auth}
+
+    def comments_feed(rng):
+        return 'GET', (f"/comments/hotel/{rng.choice(fx['hotels'])}?sortType={rng.choice(['newest', 'highest'])}"
+                       f"&paging=cursor&per_page=20"), {'headers': auth}
+
+    def create_comment(rng):
+        return 'POST', '/comments', {'headers': auth, 'form': {
+            'rating_point': str(rng.randint(1, 10)), 'hotel_id': str(rng.choice(fx['booked_hotels'])),
+            'comment': 'bench'}}
+
+    def get_discount(rng):
+        return 'GET', '/get-discount', {'headers': auth}
+
+    def all_discounts(rng):
+        return 'GET', '/all-discounts', {'headers': auth}
+
+    def change_discount(rng):
+        return 'POST', '/change-discount', {'headers': auth, 'json_body': {'discount_id': rng.choice(fx['discounts'])}}
+
+    def login(rng):
+        return 'POST', '/login', {'json_body': {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}}
+
+    def profile(rng):
+        return 'GET', '/profile', {'headers': auth}
+
+    def locations(rng):
+        return 'GET', '/api/locations', {'headers': auth}
+
+    def admin_hotels(rng):
+        return 'GET', '/hotels', {}
+
+    def admin_hotel_detail(rng):
+        return 'GET', f"/hotels/{rng.choice(fx['hotels'])}", {}
+
+    def admin_users(rng):
+        return 'GET', '/users', {}
+
+    return [
+        # name, blueprint, request builder, expected statuses
+        ('hotels.list', 'hotels', hotels_list, {200}),
+        ('hotels.page', 'hotels', hotels_page, {200}),
+        ('hotels.filter', 'hotels', hotels_filter, {200}),
+        ('hotels.search', 'hotels', hotels_search, {200}),
+        ('hotel_rooms.list', 'hotel_rooms', hotel_rooms, {200}),
+        ('booking.available_rooms', 'booking', available_rooms, {200}),
+        ('booking.calculate_price', 'booking', calculate_price, {200}),
+        ('booking.create', 'booking', create_booking, {201, 409}),
+        ('booking.history', 'booking', booking_history, {200}),
+        ('comments.feed', 'comments', comments_feed, {200}),
+        ('comments.create', 'comments', create_comment, {201}),
+        ('discount.list_user', 'discount', get_discount, {200}),
+        ('discount.list_all', 'discount', all_discounts, {200}),
+        ('discount.redeem', 'discount', change_discount, {200}),
+        ('users.login', 'users', login, {200}),
+        ('users.profile', 'users', profile, {200}),
+        ('locations.list', 'locations', locations, {200}),
+        ('admin.hotels', 'admin', admin_hotels, {200}),
+        ('admin.hotel_detail', 'admin', admin_hotel_detail, {200}),
+        ('admin.users', 'admin', admin_users, {200}),
+    ]
+
+
+# --- measurement ----------------------------------------------------------------------
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an ascending list
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), math.ceil(p / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(make_transport, build, expect, total, warmup, concurrency, seed):
+    samples = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker(index, count, measured):
+        transport = make_transport()
+        rng = random.Random(seed * 1000003 + index + (0 if measured else 7919))
+        local = []
+        for _ in range(count):
+            method, url, options = build(rng)
+            started = time.perf_counter()
+            try:
+                status, queries = transport.request(method, url, **options)
+            except Exception as e:
+                # Counted as a failed request rather than silently ending the worker
+                status, queries = type(e).__name__, 0
+            local.append((time.perf_counter() - started, queries, status))
+        if measured:
+            with lock:
+                samples.extend(local)
+
+    def run(count, measured):
+        threads = [threading.Thread(target=worker, args=(n, count // concurrency + (n < count % concurrency), measured))
+                   for n in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    if warmup:
+        run(warmup, False)
+    elapsed = run(total, True)
+
+    latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+    queries = [count for _, count, _ in samples]
+    statuses.update(str(status) for _, _, status in samples)
+    errors = sum(1 for _, _, status in samples if status not in expect)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'statuses': dict(sorted(statuses.items())),
+        'seconds': round(elapsed, 4),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50': _rounded(percentile(latencies, 50)),
+            'p95': _rounded(percentile(latencies, 95)),
+            'p99': _rounded(percentile(latencies, 99)),
+            'max': _rounded(latencies[-1] if latencies else None)
+        },
+        'queries_per_request': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries) if queries else None
+        }
+    }
+
+
+def _rounded(value):
+    return round(value, 3) if value is not None else None
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                    text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def dataset_counts():
+    with app.app_context():
+        return {model.__tablename__: db.session.execute(select(func.count()).select_from(model)).scalar()
+                for model in (Locations, Hotel, Hotel_Room, Users)}
+
+
+def print_report(results, baseline=None):
+    header = f"{'scenario':<26}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>7}{'errors':>8}"
+    if baseline:
+        header += f"{'Δ req/s':>10}{'Δ p95':>9}"
+    print(header)
+    for name, result in results.items():
+        latency = result['latency_ms']
+        line = (f"{name:<26}{result['throughput_rps'] or 0:>9.1f}{latency['p50'] or 0:>9.2f}{latency['p95'] or 0:>9.2f}"
+                f"{latency['p99'] or 0:>9.2f}{result['queries_per_request']['mean'] or 0:>7.1f}{result['errors']:>8}")
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += f"{_change(result['throughput_rps'], previous['throughput_rps']):>10}"
+            line += f"{_change(latency['p95'], previous['latency_ms']['p95']):>9}"
+        print(line)
+
+
+def _change(current, previous):
+    if not current or not previous:
+        return '-'
+    return f'{(current - previous) / previous * 100:+.0f}%'
+
+
+def main():
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.no_cache:
+        response_cache.max_bytes = response_cache.max_entry_bytes = 0
+    prepare_database(load_data=not args.database)
+    instrument(app)
+
+    server = None
+    if args.transport == 'http':
+        server = start_server(app)
+        host, port = server.server_address[:2]
+        make_transport = lambda: HTTPTransport(host, port)  # noqa: E731
+    else:
+        make_transport = lambda: TestClientTransport(app)  # noqa: E731
+
+    fixtures = seed_fixtures()
+    scenarios = build_scenarios(fixtures)
+    if args.scenarios:
+        wanted = {name.strip() for name in args.scenarios.split(',') if name.strip()}
+        scenarios = [scenario for scenario in scenarios if scenario[0] in wanted or scenario[1] in wanted]
+        if not scenarios:
+            sys.exit(f'No scenarios match {sorted(wanted)}')
+
+    results = {}
+    try:
+        for name, blueprint, build, expect in scenarios:
+            results[name] = dict(blueprint=blueprint, **run_scenario(
+                make_transport, build, expect, args.requests, args.warmup, args.concurrency, args.seed))
+            print(f"  {name}: {results[name]['throughput_rps']} req/s", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    commit, dirty = git_revision()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': os.path.abspath(args.database) if args.database else None,
+            'dataset': dataset_counts(),
+            'options': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+        },
+        'scenarios': results
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['scenarios']
+    print_report(results, baseline)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(RESULTS_DIR, f"{commit or 'unknown'}{'-dirty' if dirty else ''}-{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f'Results written to {output}')
+    if any(result['errors'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from compression import compressor
+
+# Per-process response cache for read-heavy catalog endpoints. Entries are dropped
+# whenever a transaction that touched one of WATCHED_TABLES commits, whether the
+# write came from the ORM (admin routes, comments) or Core inserts (import_data).
+WATCHED_TABLES = {'Hotel', 'Hotel_Images', 'Hotel_Facilities', 'Facilities', 'Locations', 'Discount', 'Comment'}
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class CacheEntry:
+    __slots__ = ('body', 'mimetype', 'etag', 'size', 'variants')
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.size = len(body)
+        # Content-Encoding -> compressed body, or None when compressing did not pay off
+        self.variants = {}
+
+
+# LRU of rendered response bodies bounded by total byte size
+class ResponseCache:
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', self.max_bytes)
+        self.max_entry_bytes = app.config.get('RESPONSE_CACHE_MAX_ENTRY_BYTES', self.max_bytes // 8)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry, generation):
+        if entry.size > self.max_entry_bytes:
+            return
+        with self._lock:
+            # A write committed while the view was rendering; the body may already be stale
+            if generation != self.generation:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size
+            self._entries[key] = entry
+            self._size += entry.size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def variant(self, key, entry, encoding):
+        # The entry's body in `encoding`, compressed on first request and kept with the entry
+        if encoding in entry.variants:
+            return entry.variants[encoding], True
+        data = compressor.compress(entry.body, encoding)
+        if len(data) >= entry.size:
+            data = None
+        with self._lock:
+            if encoding not in entry.variants:
+                entry.variants[encoding] = data
+                if data is not None:
+                    entry.size += len(data)
+                    if self._entries.get(key) is entry:
+                        self._size += len(data)
+        return data, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cache_key():
+    # Path plus sorted query parameters, so ?a=1&b=2 and ?b=2&a=1 share an entry
+    args = sorted(request.args.items(multi=True))
+    return f'{request.path}?{urlencode(args)}'
+
+
+def _finalize(response, etag):
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _entry_response(key, entry):
+    response = Response(entry.body, mimetype=entry.mimetype)
+    etag = entry.etag
+    data = None
+    encoding = compressor.negotiate(entry.mimetype, len(entry.body))
+    if encoding is not None:
+        data, precompressed = response_cache.variant(key, entry, encoding)
+        if data is not None:
+            response.set_data(data)
+            response.headers['Content-Encoding'] = encoding
+            etag = f'{etag}-{encoding}'
+    response = _finalize(response, etag)
+    if data is not None and response.status_code == 200:
+        compressor.record(encoding, len(entry.body), len(data), precompressed)
+    return response
+
+
+# Serve a view's 200 responses from the cache with ETag/304 handling, compressed per Accept-Encoding.
+# Stack it below @jwt_required() so authentication still runs on every request.
+def cached_response(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = cache_key()
+        entry = response_cache.get(key)
+        if entry is not None:
+            return _entry_response(key, entry)
+
+        generation = response_cache.generation
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+        entry = CacheEntry(response.get_data(), response.mimetype)
+        response_cache.set(key, entry, generation)
+        return _entry_response(key, entry)
+
+    return wrapper
+
+
+def _touches_watched_tables(objects):
+    return any(obj.__table__.name in WATCHED_TABLES for obj in objects if hasattr(obj, '__table__'))
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_flush(session, flush_context):
+    if _touches_watched_tables(session.new) or _touches_watched_tables(session.dirty) \
+            or _touches_watched_tables(session.deleted):
+        session.info['response_cache_dirty'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_statement(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in WATCHED_TABLES:
+            orm_execute_state.session.info['response_cache_dirty'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('response_cache_dirty', False):
+        response_cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session):
+    session.info.pop('response_cache_dirty', None)
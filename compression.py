@@ -0,0 +1,96 @@
+import gzip
+import time
+
+from flask import request
+
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+# Response compression negotiated from Accept-Encoding (brotli when available, else gzip).
+# Bodies below COMPRESS_MIN_SIZE or of other mimetypes are sent as-is. Cached responses
+# (see cache.py) keep their compressed variants, so repeated reads skip the compressor.
+# Config:
+#   COMPRESS_ENABLED          default True
+#   COMPRESS_MIN_SIZE         bytes, default 1024
+#   COMPRESS_GZIP_LEVEL       1-9, default 6
+#   COMPRESS_BROTLI_LEVEL     0-11, default 5
+#   COMPRESS_MIMETYPES        default JSON, HTML, plain text, CSS and JavaScript
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_LEVEL = 5
+DEFAULT_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+
+
+class Compressor:
+
+    def __init__(self):
+        self.enabled = True
+        self.min_size = DEFAULT_MIN_SIZE
+        self.gzip_level = DEFAULT_GZIP_LEVEL
+        self.brotli_level = DEFAULT_BROTLI_LEVEL
+        self.mimetypes = set(DEFAULT_MIMETYPES)
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', DEFAULT_GZIP_LEVEL)
+        self.brotli_level = app.config.get('COMPRESS_BROTLI_LEVEL', DEFAULT_BROTLI_LEVEL)
+        self.mimetypes = set(app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES))
+        app.after_request(self.after_request)
+
+    def compressible(self, mimetype):
+        return self.enabled and mimetype in self.mimetypes
+
+    def negotiate(self, mimetype, size):
+        # The encoding to send for a body of this type and size, or None for identity
+        if not self.compressible(mimetype) or size < self.min_size:
+            return None
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        started = time.perf_counter()
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=self.brotli_level)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        metrics.observe(f'compression.{encoding}', time.perf_counter() - started)
+        return compressed
+
+    def record(self, encoding, original_size, sent_size, precompressed=False):
+        metrics.increment(f'compression.responses.{encoding}')
+        metrics.increment('compression.bytes_in', original_size)
+        metrics.increment('compression.bytes_out', sent_size)
+        metrics.increment('compression.bytes_saved', original_size - sent_size)
+        if precompressed:
+            metrics.increment('compression.precompressed_hits')
+
+    def after_request(self, response):
+        if not self.compressible(response.mimetype):
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 206, 304)):
+            return response
+        data = response.get_data()
+        encoding = self.negotiate(response.mimetype, len(data))
+        if encoding is None:
+            return response
+        compressed = self.compress(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # Each encoding is a different representation and needs its own validator
+            response.set_etag(f'{etag}-{encoding}', weak)
+        self.record(encoding, len(data), len(compressed))
+        return response
+
+
+compressor = Compressor()
@@ -0,0 +1,86 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from extensions import db
+from metrics import metrics
+
+# Engine profile for file-backed SQLite. Every pooled connection, whether used by the ORM
+# or borrowed raw via db.engine.raw_connection(), gets these pragmas when it is opened:
+# WAL lets readers run alongside the single writer, and busy_timeout makes a writer wait
+# for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # KiB when negative
+    'temp_store': 'MEMORY'
+}
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 20
+DEFAULT_POOL_TIMEOUT = 30
+
+
+def _is_file_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def configure_engine(app):
+    # Must run before db.init_app(app): Flask-SQLAlchemy reads the options when creating the engine
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if not _is_file_sqlite(uri):
+        return
+    pragmas = dict(SQLITE_PRAGMAS, **app.config.get('SQLITE_PRAGMAS', {}))
+    app.config['SQLITE_PRAGMAS'] = pragmas
+    options = {
+        'poolclass': QueuePool,
+        'pool_size': app.config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+        'max_overflow': app.config.get('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW),
+        'pool_timeout': app.config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        'connect_args': {
+            'timeout': pragmas['busy_timeout'] / 1000,
+            'check_same_thread': False
+        }
+    }
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def install_engine_profile(app):
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = app.config.get('SQLITE_PRAGMAS', {})
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    metrics.register_gauge('db_pool', lambda: pool_stats(engine))
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'class': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow()
+        })
+    return stats
+
+
+def init_engine(app):
+    configure_engine(app)
+    db.init_app(app)
+    install_engine_profile(app)
@@ -0,0 +1,233 @@
+import bisect
+import re
+import threading
+import time
+
+from sqlalchemy import select
+
+from extensions import db
+from metrics import metrics
+from models import Facilities, Hotel, HotelFacilities
+from search import fold_text
+
+# In-memory bitmap index of hotel facilities. Each facility name (already normalized by
+# import_data.normalize_facility_name) maps to a Python int used as a bitset over hotel
+# ids, and each location to the bitset of its hotels, so "pool AND (wifi OR parking)" in
+# one location is a handful of bitwise operations instead of one join per facility.
+# Query terms match facility names by accent-insensitive token prefix, as the search
+# index does ("wifi" matches "WiFi miễn phí", "ho boi" matches "Hồ bơi ngoài trời"):
+# each term word is looked up in a sorted vocabulary of the names' folded words, so
+# resolving a term never walks the list of facility names.
+#
+# The index is built on first use and kept current by the writers: admin hotel
+# add/delete and import_data call add_hotels()/remove_hotels() after they commit.
+# Rebuilds and updates are serialized, so an update is never lost to a rebuild
+# that loaded the hotels before it.
+# Query syntax: comma-separated terms are ANDed, '|' separates alternatives within a
+# term, e.g. facilities=pool|spa,wifi.
+_SEPARATOR = re.compile(r'\s*,\s*')
+_ALTERNATIVE = re.compile(r'\s*\|\s*')
+_WORD = re.compile(r'\w+')
+LOAD_CHUNK_SIZE = 500
+
+
+def parse_facility_query(value):
+    # "pool|spa, wifi" -> [['pool', 'spa'], ['wifi']]: a conjunction of disjunctions of folded terms
+    clauses = []
+    for clause in _SEPARATOR.split(value or ''):
+        terms = [' '.join(fold_text(term).split()) for term in _ALTERNATIVE.split(clause)]
+        terms = [term for term in terms if term]
+        if terms:
+            clauses.append(terms)
+    return clauses
+
+
+def _bitset(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    bitmap = bytearray(max(ids) // 8 + 1)
+    for hotel_id in ids:
+        bitmap[hotel_id >> 3] |= 1 << (hotel_id & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+def _members(bits):
+    # Set bit positions in ascending order, scanning bytes rather than shifting the whole int
+    ids = []
+    for offset, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            ids.append(offset * 8 + low.bit_length() - 1)
+            byte ^= low
+    return ids
+
+
+class FacilityIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()        # guards the bitsets while they are read or changed
+        self._build_lock = threading.Lock()  # serializes rebuilds and updates
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._names = {}        # facility name -> hotel bitset
+        self._word_names = {}   # folded word -> facility names containing it
+        self._vocabulary = []   # sorted folded words, for prefix lookups
+        self._locations = {}    # id_location -> hotel bitset
+        self._hotels = {}     # hotel id -> (id_location, names), to clear its bits on update
+
+    def init_app(self, app):
+        metrics.register_gauge('facility_index', self.stats)
+
+    def _load(self, hotel_ids=None):
+        # {hotel_id: (id_location, {facility names})} for the given hotels, or all of them
+        hotels = select(Hotel.id, Hotel.id_location)
+        links = select(HotelFacilities.id_hotel, Facilities.name).join(
+            Facilities, Facilities.id_fac == HotelFacilities.id_facilities)
+        if hotel_ids is not None:
+            hotels = hotels.where(Hotel.id.in_(hotel_ids))
+            links = links.where(HotelFacilities.id_hotel.in_(hotel_ids))
+        loaded = {hotel_id: (id_location, set()) for hotel_id, id_location in db.session.execute(hotels)}
+        for hotel_id, name in db.session.execute(links):
+            if hotel_id in loaded:
+                loaded[hotel_id][1].add(name)
+        return loaded
+
+    def _index_name(self, name):
+        # Registers a new facility name under each of its folded words
+        self._names[name] = 0
+        for word in set(_WORD.findall(fold_text(name))):
+            if word not in self._word_names:
+                self._word_names[word] = set()
+                bisect.insort(self._vocabulary, word)
+            self._word_names[word].add(name)
+
+    def rebuild(self):
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        loaded = self._load()
+        by_name, by_location = {}, {}
+        for hotel_id, (id_location, names) in loaded.items():
+            by_location.setdefault(id_location, []).append(hotel_id)
+            for name in names:
+                by_name.setdefault(name, []).append(hotel_id)
+        with self._lock:
+            self._reset()
+            for name, ids in by_name.items():
+                self._index_name(name)
+                self._names[name] = _bitset(ids)
+            self._locations = {id_location: _bitset(ids) for id_location, ids in by_location.items()}
+            self._hotels = {hotel_id: (id_location, frozenset(names)) for hotel_id, (id_location, names) in loaded.items()}
+            self._built = True
+        metrics.increment('facility_index.rebuilds')
+        metrics.observe('facility_index.rebuild', time.perf_counter() - started)
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        with self._build_lock:
+            # Concurrent first requests wait for the one rebuild instead of each running their own
+            if not self._built:
+                self._rebuild()
+
+    def _clear(self, hotel_id):
+        previous = self._hotels.pop(hotel_id, None)
+        if previous is None:
+            return
+        id_location, names = previous
+        mask = ~(1 << hotel_id)
+        self._locations[id_location] = self._locations.get(id_location, 0) & mask
+        for name in names:
+            self._names[name] &= mask
+
+    def add_hotels(self, hotel_ids):
+        # (Re)index hotels after their rows or facility links were committed
+        hotel_ids = list(hotel_ids)
+        if not hotel_ids:
+            return
+        with self._build_lock:
+            # Not built yet: the first rebuild will read these rows from the database
+            if not self._built:
+                return
+            loaded = {}
+            for start in range(0, len(hotel_ids), LOAD_CHUNK_SIZE):
+                loaded.update(self._load(hotel_ids[start:start + LOAD_CHUNK_SIZE]))
+            with self._lock:
+                for hotel_id in hotel_ids:
+                    self._clear(hotel_id)
+                for hotel_id, (id_location, names) in loaded.items():
+                    bit = 1 << hotel_id
+                    self._locations[id_location] = self._locations.get(id_location, 0) | bit
+                    for name in names:
+                        if name not in self._names:
+                            self._index_name(name)
+                        self._names[name] |= bit
+                    self._hotels[hotel_id] = (id_location, frozenset(names))
+        metrics.increment('facility_index.updates', len(hotel_ids))
+
+    def remove_hotels(self, hotel_ids):
+        with self._build_lock:
+            if not self._built:
+                return
+            with self._lock:
+                for hotel_id in hotel_ids:
+                    self._clear(hotel_id)
+
+    def _prefix_names(self, prefix):
+        # Facility names with a word starting with `prefix`: a range of the sorted vocabulary
+        names = set()
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            names |= self._word_names[self._vocabulary[position]]
+            position += 1
+        return names
+
+    def _term_bits(self, term):
+        # Names matching every word of the term, then the union of their bitsets
+        names = None
+        for word in _WORD.findall(term):
+            names = self._prefix_names(word) if names is None else names & self._prefix_names(word)
+            if not names:
+                return 0
+        bits = 0
+        for name in names or ():
+            bits |= self._names[name]
+        return bits
+
+    def match(self, clauses, id_location=None):
+        # Sorted ids of hotels (in id_location, if given) satisfying every clause of parse_facility_query()
+        self._ensure_built()
+        started = time.perf_counter()
+        with self._lock:
+            if not clauses:
+                return []
+            # -1 has every bit set, so without a location the first clause selects freely
+            bits = self._locations.get(id_location, 0) if id_location is not None else -1
+            for terms in clauses:
+                if not bits:
+                    break
+                clause_bits = 0
+                for term in terms:
+                    clause_bits |= self._term_bits(term)
+                bits &= clause_bits
+        ids = _members(bits)
+        metrics.observe('facility_index.match', time.perf_counter() - started)
+        return ids
+
+    def stats(self):
+        with self._lock:
+            return {
+                'built': self._built,
+                'facilities': len(self._names),
+                'words': len(self._vocabulary),
+                'hotels': len(self._hotels),
+                'bytes': sum((bits.bit_length() + 7) // 8 for bits in self._names.values())
+            }
+
+
+facility_index = FacilityIndex()
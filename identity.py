@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from flask import jsonify
+from flask_jwt_extended import create_access_token, current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from extensions import db
+from models import Users
+
+# JWT identity -> user resolution. Tokens carry the numeric user id in a 'uid' claim and the
+# email as identity; the loader below resolves them through a bounded LRU of lightweight
+# records, and flask_jwt_extended memoizes the result for the rest of the request, so
+# handlers read `current_user` instead of querying Users by email.
+DEFAULT_CACHE_SIZE = 10000
+
+UserRecord = namedtuple('UserRecord', ['id', 'email', 'user_name'])
+
+
+class UserCache:
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            record = self._records.get(user_id)
+            if record is not None:
+                self._records.move_to_end(user_id)
+            return record
+
+    def put(self, record):
+        with self._lock:
+            self._records[record.id] = record
+            self._records.move_to_end(record.id)
+            while len(self._records) > self.max_size:
+                self._records.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._records.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def user_record(user):
+    return UserRecord(user.id, user.email, user.user_name)
+
+
+def current_user_row():
+    # The Users row behind current_user, or None once it is gone. The cache is per process and
+    # only the process that deleted a user drops its record, so other workers can still
+    # resolve the token; a missing row also evicts the stale record here.
+    user = db.session.get(Users, current_user.id)
+    if user is None:
+        user_cache.invalidate(current_user.id)
+    return user
+
+
+def user_not_found():
+    return jsonify({'status': 'error', 'message': 'User not found'}), 404
+
+
+def create_user_token(user):
+    user_cache.put(user_record(user))
+    return create_access_token(identity=user.email, additional_claims={'uid': user.id})
+
+
+def init_app(app, jwt):
+    user_cache.max_size = app.config.get('USER_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+
+    @jwt.user_lookup_loader
+    def load_user(jwt_header, jwt_data):
+        email = jwt_data[app.config.get('JWT_IDENTITY_CLAIM', 'sub')]
+        user_id = jwt_data.get('uid')
+        record = user_cache.get(user_id) if user_id is not None else None
+        if record is None:
+            # Tokens issued before the uid claim existed still resolve by email
+            if user_id is not None:
+                user = db.session.get(Users, user_id)
+            else:
+                user = Users.query.filter_by(email=email).first()
+            if not user:
+                return None
+            record = user_record(user)
+            user_cache.put(record)
+        # A token minted for an address the user has since changed no longer identifies them
+        if record.email != email:
+            return None
+        return record
+
+    @jwt.user_lookup_error_loader
+    def lookup_failed(jwt_header, jwt_data):
+        return user_not_found()
+
+
+# Drop cached records once a transaction that changed or deleted the user commits
+@event.listens_for(Users, 'after_update')
+@event.listens_for(Users, 'after_delete')
+def _queue_invalidation(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('stale_user_ids', set()).add(target.id)
+    user_cache.invalidate(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_users(session):
+    for user_id in session.info.pop('stale_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_users(session):
+    session.info.pop('stale_user_ids', None)
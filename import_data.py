@@ -1,106 +1,265 @@
 import json
+import re
+import sys
+import time
+import unicodedata
+from sqlalchemy import bindparam, func, insert, select, update
 from extensions import db
-from models import Locations, Facilities, Hotel, HotelFacilities, HotelImages, Hotel_Room
+from models import Locations, Facilities, Hotel, HotelFacilities, HotelImages
+from search import index_hotels
+from facility_index import facility_index
+
+IMPORT_FILE = 'output.json'
+COUNTRY = 'Việt Nam'
+BATCH_SIZE = 2000  # hotels per transaction
+READ_CHUNK_SIZE = 1 << 16
+
+# Distance to the city centre from the crawled text: "Cách trung tâm 0,6km",
+# "Cách trung tâm thành phố 2km", "Cách trung tâm 150m", "Ở trung tâm thành phố", or a bare
+# "1.5 km" / "1.5" (km) as typed in the admin. Distances to landmarks are not the centre and stay NULL.
+_DISTANCE_NUMBER = r'(\d+(?:[.,]\d+)?)\s*(km|m)?'
+DISTANCE_TO_CENTRE = re.compile(r'^cách trung tâm(?: thành phố)?\s+' + _DISTANCE_NUMBER + r'\b')
+DISTANCE_BARE = re.compile(r'^' + _DISTANCE_NUMBER + r'$')
+IN_CENTRE = re.compile(r'^ở trung tâm\b')
 
 
 def normalize_facility_name(name):
     return ' '.join(name.strip().lower().split())
 
-def import_data(db):
-    try:
-        with open('output.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        for location_data in data:
-            city = location_data['city']
-            country = 'Việt Nam'
-            location = Locations.query.filter_by(city=city, country=country).first()
-            if not location:
-                location = Locations(name=city, country=country, city=city)
-                db.session.add(location)
-        db.session.commit()
-
-        all_facilities = set()
-        for location_data in data:
-            for hotel_data in location_data['Hotel']:
-                if hotel_data['Name']:
-                    for facility in hotel_data['Facilities']:
-                        normalized_facility = normalize_facility_name(facility)
-                        all_facilities.add(normalized_facility)
-
-        for facility_name in all_facilities:
-            facility = Facilities.query.filter_by(name=facility_name).first()
-            if not facility:
-                facility = Facilities(name=facility_name, description=facility_name)
-                db.session.add(facility)
-        db.session.commit()
-
-        for location_data in data:
-            city = location_data['city']
-            location = Locations.query.filter_by(city=city, country='Việt Nam').first()
-
-            for hotel_data in location_data['Hotel']:
-                if not hotel_data['Name']:
-                    continue
 
-                hotel = Hotel.query.filter_by(hotel_name=hotel_data['Name']).first()
-                description = '\n'.join(hotel_data.get('Description', [])) if hotel_data.get('Description') else ''
-
-                # Convert policies to string
-                policies = hotel_data.get('Policies', '')
-                if isinstance(policies, dict) or isinstance(policies, list):
-                    policies = json.dumps(policies, ensure_ascii=False)
-
-                if not hotel:
-                    try:
-                        hotel = Hotel(
-                            hotel_name=hotel_data['Name'],
-                            new_price=int(hotel_data['New price'].replace(',', '')) if hotel_data.get(
-                                'New price') else 0,
-                            old_price=int(hotel_data['Old price'].replace(',', '')) if hotel_data.get(
-                                'Old price') else 0,
-                            hotel_star=float(hotel_data['Star']) if hotel_data.get('Star') else 0.0,
-                            hotel_rating=float(hotel_data['Rating'].replace(',', '.')) if hotel_data.get(
-                                'Rating') else 0.0,
-                            address=hotel_data.get('Location', ''),
-                            policies=policies,
-                            description=description,
-                            distance=hotel_data.get('Distance', ''),
-                            id_location=location.id_location
-                        )
-                        db.session.add(hotel)
-                        db.session.flush()
-                    except ValueError as ve:
-                        print(f"Error processing hotel {hotel_data['Name']}: {str(ve)}")
+def parse_distance_km(text):
+    if not text:
+        return None
+    text = ' '.join(unicodedata.normalize('NFC', text).lower().split())
+    if IN_CENTRE.match(text):
+        return 0.0
+    match = DISTANCE_TO_CENTRE.match(text) or DISTANCE_BARE.match(text)
+    if match is None:
+        return None
+    value = float(match.group(1).replace(',', '.'))
+    return value / 1000 if match.group(2) == 'm' else value
+
+
+def iter_json_array(path, chunk_size=READ_CHUNK_SIZE):
+    # Yield the items of a top-level JSON array one at a time, so only one
+    # location record is held in memory however large the crawl is.
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != '[':
+                        raise ValueError(f'{path} does not contain a JSON array')
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A scalar cut by a chunk boundary still decodes ("123" of "12345"), so an
+                    # item only counts once the delimiter after it has been read
+                    after = end
+                    while after < len(buffer) and buffer[after] in ' \t\r\n':
+                        after += 1
+                    if after < len(buffer) and buffer[after] in ',]':
+                        yield item
+                        pos = end
                         continue
+                    if eof:
+                        if after < len(buffer):
+                            raise ValueError(f'Expected "," or "]" after an item in {path}')
+                        yield item
+                        pos = end
+                        continue
+            elif eof:
+                if started:
+                    raise ValueError(f'Unterminated JSON array in {path}')
+                return
+            # Read at least as much again as the unparsed tail before retrying, so a large item
+            # is decoded O(log size) times rather than once per chunk
+            wanted = max(chunk_size, len(buffer) - pos)
+            chunks, size = [], 0
+            while size < wanted:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    eof = True
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+            buffer, pos = buffer[pos:] + ''.join(chunks), 0
+
+
+def parse_hotel(hotel_data, id_location):
+    description = '\n'.join(hotel_data.get('Description', [])) if hotel_data.get('Description') else ''
+
+    # Convert policies to string
+    policies = hotel_data.get('Policies', '')
+    if isinstance(policies, dict) or isinstance(policies, list):
+        policies = json.dumps(policies, ensure_ascii=False)
+
+    return {
+        'hotel_name': hotel_data['Name'],
+        'new_price': int(hotel_data['New price'].replace(',', '')) if hotel_data.get('New price') else 0,
+        'old_price': int(hotel_data['Old price'].replace(',', '')) if hotel_data.get('Old price') else 0,
+        'hotel_star': float(hotel_data['Star']) if hotel_data.get('Star') else 0.0,
+        'hotel_rating': float(hotel_data['Rating'].replace(',', '.')) if hotel_data.get('Rating') else 0.0,
+        'address': hotel_data.get('Location', ''),
+        'policies': policies,
+        'description': description,
+        'distance': hotel_data.get('Distance', ''),
+        'distance_km': parse_distance_km(hotel_data.get('Distance')),
+        'id_location': id_location
+    }
+
+
+class BulkImporter:
+    """Imports crawl data with one preload of existing keys and batched executemany inserts."""
+
+    def __init__(self, session, batch_size=BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self.rows_inserted = 0
+        self._preload()
+        self._reset_pending()
+
+    def _preload(self):
+        session = self.session
+        self.locations = {(city, country): id_location for id_location, city, country in
+                          session.execute(select(Locations.id_location, Locations.city, Locations.country))}
+        self.facilities = {name: id_fac for id_fac, name in session.execute(select(Facilities.id_fac, Facilities.name))}
+        self.hotels = {}
+        for hotel_id, hotel_name in session.execute(select(Hotel.id, Hotel.hotel_name).order_by(Hotel.id)):
+            self.hotels.setdefault(hotel_name, hotel_id)
+        self.hotel_facilities = set(session.execute(select(HotelFacilities.id_hotel, HotelFacilities.id_facilities)).tuples())
+        self.images = set(session.execute(select(HotelImages.hotel_id, HotelImages.image_url)).tuples())
+
+        # Keys are assigned up front so child rows can reference parents within the same batch
+        self.next_location_id = (session.execute(select(func.max(Locations.id_location))).scalar() or 0) + 1
+        self.next_facility_id = (session.execute(select(func.max(Facilities.id_fac))).scalar() or 0) + 1
+        self.next_hotel_id = (session.execute(select(func.max(Hotel.id))).scalar() or 0) + 1
 
-                # Import Hotel Facilities
-                for facility_name in hotel_data.get('Facilities', []):
-                    normalized_facility = normalize_facility_name(facility_name)
-                    facility = Facilities.query.filter_by(name=normalized_facility).first()
-                    if facility:
-                        hotel_facility = HotelFacilities.query.filter_by(
-                            id_hotel=hotel.id, id_facilities=facility.id_fac
-                        ).first()
-                        if not hotel_facility:
-                            hotel_facility = HotelFacilities(
-                                id_hotel=hotel.id,
-                                id_facilities=facility.id_fac
-                            )
-                            db.session.add(hotel_facility)
-
-                for image_url in hotel_data.get('Images', []):
-                    image = HotelImages.query.filter_by(hotel_id=hotel.id, image_url=image_url).first()
-                    if not image:
-                        image = HotelImages(
-                            hotel_id=hotel.id,
-                            image_url=image_url
-                        )
-                        db.session.add(image)
-
-        db.session.commit()
-        print("Data imported successfully!")
+    def _reset_pending(self):
+        self.pending = {Locations: [], Facilities: [], Hotel: [], HotelFacilities: [], HotelImages: []}
+        self.touched_hotel_ids = set()
+
+    def location_id(self, city, country=COUNTRY):
+        key = (city, country)
+        if key not in self.locations:
+            self.locations[key] = self.next_location_id
+            self.pending[Locations].append({'id_location': self.next_location_id, 'name': city, 'country': country, 'city': city})
+            self.next_location_id += 1
+        return self.locations[key]
+
+    def facility_id(self, name):
+        if name not in self.facilities:
+            self.facilities[name] = self.next_facility_id
+            self.pending[Facilities].append({'id_fac': self.next_facility_id, 'name': name, 'description': name})
+            self.next_facility_id += 1
+        return self.facilities[name]
+
+    def add_hotel(self, hotel_data, id_location):
+        hotel_id = self.hotels.get(hotel_data['Name'])
+        if hotel_id is None:
+            try:
+                row = parse_hotel(hotel_data, id_location)
+            except ValueError as ve:
+                print(f"Error processing hotel {hotel_data['Name']}: {str(ve)}")
+                return
+            hotel_id = self.next_hotel_id
+            self.next_hotel_id += 1
+            self.hotels[row['hotel_name']] = hotel_id
+            self.pending[Hotel].append(dict(row, id=hotel_id))
+            self.touched_hotel_ids.add(hotel_id)
+
+        for facility_name in hotel_data.get('Facilities', []):
+            pair = (hotel_id, self.facility_id(normalize_facility_name(facility_name)))
+            if pair not in self.hotel_facilities:
+                self.hotel_facilities.add(pair)
+                self.pending[HotelFacilities].append({'id_hotel': pair[0], 'id_facilities': pair[1]})
+                self.touched_hotel_ids.add(hotel_id)
+
+        for image_url in hotel_data.get('Images', []):
+            key = (hotel_id, image_url)
+            if key not in self.images:
+                self.images.add(key)
+                self.pending[HotelImages].append({'hotel_id': hotel_id, 'image_url': image_url})
+
+        if len(self.pending[Hotel]) >= self.batch_size:
+            self.flush()
+
+    def add_location(self, location_data):
+        id_location = self.location_id(location_data['city'])
+        for hotel_data in location_data['Hotel']:
+            if hotel_data['Name']:
+                self.add_hotel(hotel_data, id_location)
+
+    def flush(self):
+        # Parents before children; one transaction per batch
+        for model, rows in self.pending.items():
+            if rows:
+                self.session.execute(insert(model.__table__), rows)
+                self.rows_inserted += len(rows)
+        # Keep the full-text index in step with new hotels and facilities
+        index_hotels(self.touched_hotel_ids)
+        self.session.commit()
+        facility_index.add_hotels(self.touched_hotel_ids)
+        self._reset_pending()
+
+    def run(self, path):
+        started = time.perf_counter()
+        for location_data in iter_json_array(path):
+            self.add_location(location_data)
+        self.flush()
+        elapsed = time.perf_counter() - started
+        return {
+            'rows': self.rows_inserted,
+            'seconds': elapsed,
+            'rows_per_second': self.rows_inserted / elapsed if elapsed else 0.0
+        }
+
+
+def backfill_distance_km(batch_size=BATCH_SIZE):
+    # Fills distance_km for hotels stored before the column existed
+    rows = [{'hotel_id': hotel_id, 'distance_km': parse_distance_km(distance)}
+            for hotel_id, distance in db.session.execute(
+                select(Hotel.id, Hotel.distance).where(Hotel.distance_km.is_(None), Hotel.distance.isnot(None)))]
+    rows = [row for row in rows if row['distance_km'] is not None]
+    statement = update(Hotel.__table__).where(Hotel.__table__.c.id == bindparam('hotel_id')).values(
+        distance_km=bindparam('distance_km'))
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(statement, rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
+
+
+def import_data(db, path=IMPORT_FILE, batch_size=BATCH_SIZE):
+    try:
+        stats = BulkImporter(db.session, batch_size).run(path)
+        print(f"Data imported successfully! {stats['rows']} rows in {stats['seconds']:.2f}s "
+              f"({stats['rows_per_second']:.0f} rows/s)")
+        return stats
     except Exception as e:
         db.session.rollback()
         print(f"Error importing data: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+if __name__ == '__main__':
+    from app import app
+    from search import ensure_search_index
+
+    with app.app_context():
+        db.create_all()
+        ensure_search_index()
+        import_data(db, sys.argv[1] if len(sys.argv) > 1 else IMPORT_FILE)
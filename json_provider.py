@@ -0,0 +1,52 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib provider is used instead
+    orjson = None
+
+# Flask JSON provider backed by orjson when it is installed, with the same output rules as
+# Flask's default provider: sorted keys, dates as HTTP dates (via the provider's default()),
+# 2-space indentation when pretty-printing, and non-string keys converted to strings.
+# Anything orjson rejects (e.g. integers beyond 64 bits) falls back to the stdlib encoder,
+# as does any call that passes explicit json.dumps() arguments.
+
+
+class FastJSONProvider(DefaultJSONProvider):
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dump_bytes(self, obj, indent=False):
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._options(indent))
+            except TypeError:
+                pass
+        kwargs = {'indent': 2} if indent else {}
+        return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dump_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Encode straight to bytes instead of str -> bytes
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dump_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, jsonify, request
+
+from metrics import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - originals are served for every variant
+    Image = None
+
+# Upload storage for comment images and avatars.
+#   - Files are copied in chunks while hashing, and rejected as soon as they pass the size
+#     limit; MAX_CONTENT_LENGTH bounds the whole request before any of that.
+#   - Each file is stored once under its SHA-256 (static/uploads/ab/abcdef....jpg), so
+#     repeated uploads of the same image share storage and URLs never change meaning.
+#   - Thumbnail and medium variants are rendered by a background thread pool (Pillow is
+#     optional); responses carry the variant URLs straight away.
+#   - Files are served from /media/<ab>/<name> (routes/media.py) as immutable resources.
+# Config:
+#   MEDIA_ROOT                directory for stored files (default static/uploads)
+#   MEDIA_MAX_FILE_SIZE       bytes per file (default 5 MB)
+#   MAX_CONTENT_LENGTH        bytes per request, set to 16 MB unless configured
+#   MEDIA_WORKERS             variant rendering threads (default 2; 0 renders inline)
+MEDIA_ROOT = 'static/uploads'
+MEDIA_URL_PREFIX = '/media'
+DEFAULT_MAX_FILE_SIZE = 5 * 1024 * 1024
+DEFAULT_MAX_REQUEST_SIZE = 16 * 1024 * 1024
+DEFAULT_WORKERS = 2
+CHUNK_SIZE = 64 * 1024
+# variant name -> longest side in pixels
+VARIANTS = {'thumb': 200, 'medium': 800}
+# Detected from the file header rather than trusted from the client's filename
+SIGNATURES = {b'\xff\xd8\xff': 'jpg', b'\x89PNG\r\n\x1a\n': 'png'}
+PIL_FORMATS = {'jpg': 'JPEG', 'png': 'PNG'}
+MEDIA_NAME = re.compile(r'^([0-9a-f]{2})/(\1[0-9a-f]{62})(?:_(' + '|'.join(VARIANTS) + r'))?\.(jpg|png)$')
+
+StoredMedia = namedtuple('StoredMedia', ['digest', 'ext', 'url', 'variants', 'deduplicated'])
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadTooLarge(UploadError):
+    pass
+
+
+class MediaStore:
+
+    def __init__(self):
+        self.root = MEDIA_ROOT
+        self.max_file_size = DEFAULT_MAX_FILE_SIZE
+        self.workers = DEFAULT_WORKERS
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.root = app.config.get('MEDIA_ROOT', MEDIA_ROOT)
+        self.max_file_size = app.config.get('MEDIA_MAX_FILE_SIZE', DEFAULT_MAX_FILE_SIZE)
+        self.workers = app.config.get('MEDIA_WORKERS', DEFAULT_WORKERS)
+        if app.config.get('MAX_CONTENT_LENGTH') is None:
+            app.config['MAX_CONTENT_LENGTH'] = DEFAULT_MAX_REQUEST_SIZE
+        app.before_request(self._check_request_size)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _check_request_size(self):
+        # Refuse oversized bodies up front, before a view's form parsing would read them
+        limit = current_app.config.get('MAX_CONTENT_LENGTH')
+        if limit and request.content_length and request.content_length > limit:
+            metrics.increment('media.rejected_requests')
+            return jsonify({
+                'status': 'error',
+                'message': f'Request body exceeds {limit / (1024 * 1024)}MB'
+            }), 413
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='media')
+            return self._executor
+
+    def path(self, digest, ext, variant=None):
+        name = f'{digest}_{variant}.{ext}' if variant else f'{digest}.{ext}'
+        return os.path.join(self.root, digest[:2], name)
+
+    def url(self, digest, ext, variant=None):
+        name = f'{digest}_{variant}.{ext}' if variant else f'{digest}.{ext}'
+        return f'{MEDIA_URL_PREFIX}/{digest[:2]}/{name}'
+
+    def variant_urls(self, url):
+        # Variant URLs for a stored original; anything else (legacy or external URLs) maps to itself
+        parsed = self.parse_url(url)
+        if parsed is None or Image is None:
+            return {name: url for name in VARIANTS} if url else None
+        digest, ext = parsed
+        return {name: self.url(digest, ext, name) for name in VARIANTS}
+
+    def parse_url(self, url):
+        # (digest, ext) for a stored original's URL, including the older /static/uploads/ form
+        for prefix in (MEDIA_URL_PREFIX + '/', '/' + self.root.replace(os.sep, '/') + '/'):
+            if url and url.startswith(prefix):
+                match = MEDIA_NAME.match(url[len(prefix):])
+                if match and match.group(3) is None:
+                    return match.group(2), match.group(4)
+        return None
+
+    def resolve(self, name):
+        # Path on disk for a /media/<name> request and whether it is the exact file asked for.
+        # A variant that is still being rendered falls back to its original.
+        match = MEDIA_NAME.match(name)
+        if match is None:
+            return None, False
+        _, digest, variant, ext = match.groups()
+        path = self.path(digest, ext, variant)
+        if os.path.exists(path):
+            return path, True
+        if variant and os.path.exists(self.path(digest, ext)):
+            self.schedule_variants(digest, ext)
+            return self.path(digest, ext), False
+        return None, False
+
+    def save(self, file_storage, max_size=None):
+        max_size = max_size or self.max_file_size
+        stream = file_storage.stream
+        header = stream.read(CHUNK_SIZE)
+        ext = next((ext for signature, ext in SIGNATURES.items() if header.startswith(signature)), None)
+        if ext is None:
+            raise UploadError(f'Unsupported image type. Allowed types: {sorted(set(SIGNATURES.values()))}')
+
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                chunk = header
+                while chunk:
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadTooLarge(f'Image file size exceeds {max_size / (1024 * 1024)}MB')
+                    digest.update(chunk)
+                    out.write(chunk)
+                    chunk = stream.read(CHUNK_SIZE)
+
+            digest = digest.hexdigest()
+            final_path = self.path(digest, ext)
+            deduplicated = os.path.exists(final_path)
+            if deduplicated:
+                os.remove(temp_path)
+                metrics.increment('media.dedup_hits')
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(temp_path, final_path)
+                metrics.increment('media.bytes_stored', size)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        metrics.increment('media.uploads')
+        self.schedule_variants(digest, ext)
+        url = self.url(digest, ext)
+        return StoredMedia(digest, ext, url, self.variant_urls(url), deduplicated)
+
+    def discard(self, stored):
+        # Undo a save from a failed request; files that were already stored before it are kept
+        if stored.deduplicated:
+            return
+        for variant in [None, *VARIANTS]:
+            path = self.path(stored.digest, stored.ext, variant)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def schedule_variants(self, digest, ext):
+        if Image is None:
+            return
+        missing = [name for name in VARIANTS if not os.path.exists(self.path(digest, ext, name))]
+        if not missing:
+            return
+        if self.workers:
+            self._pool().submit(self._render_variants, digest, ext, missing)
+        else:
+            self._render_variants(digest, ext, missing)
+
+    def _render_variants(self, digest, ext, names):
+        try:
+            with Image.open(self.path(digest, ext)) as original:
+                original.load()
+                for name in names:
+                    image = original.copy()
+                    image.thumbnail((VARIANTS[name], VARIANTS[name]))
+                    target = self.path(digest, ext, name)
+                    # Written under a temporary name so a half-written variant is never served
+                    temp_path = f'{target}.{threading.get_ident()}.part'
+                    image.save(temp_path, format=PIL_FORMATS[ext], optimize=True)
+                    os.replace(temp_path, target)
+            metrics.increment('media.variants_rendered', len(names))
+        except Exception:
+            metrics.increment('media.variant_errors')
+
+
+media_store = MediaStore()
@@ -0,0 +1,67 @@
+import threading
+from collections import deque
+
+SAMPLE_WINDOW = 1024
+
+
+class Timing:
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000 if ordered else None
+
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else None,
+            'max_ms': self.max * 1000,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99)
+        }
+
+
+# In-process counters, timings (percentiles over the last SAMPLE_WINDOW samples) and gauges
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+        self._gauges = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = Timing()
+            timing.count += 1
+            timing.total += seconds
+            timing.max = max(timing.max, seconds)
+            timing.samples.append(seconds)
+
+    def register_gauge(self, name, callback):
+        # callback() is evaluated on every snapshot and must return JSON-serializable data
+        self._gauges[name] = callback
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: timing.snapshot() for name, timing in self._timings.items()}
+        gauges = {name: callback() for name, callback in self._gauges.items()}
+        return {'counters': counters, 'timings': timings, 'gauges': gauges}
+
+
+metrics = Metrics()
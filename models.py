@@ -1,6 +1,10 @@
 from extensions import db
 from datetime import datetime
 
+# Stand-ins for a missing distance_km that sort those hotels last, by direction (descending?).
+# They are inlined as SQL text rather than bound, so the ORDER BY expression is the one indexed.
+UNKNOWN_DISTANCE_SQL = {False: '1e9', True: '-1.0'}
+
 class Discount(db.Model):
     __tablename__ = 'Discount'
     id = db.Column(db.Integer, primary_key=True)
@@ -22,17 +26,38 @@ class Hotel(db.Model):
     policies = db.Column(db.String)
     description = db.Column(db.String)
     distance = db.Column(db.String)
+    # Kilometres to the city centre parsed from `distance` (import_data.parse_distance_km); NULL if unknown
+    distance_km = db.Column(db.Float)
     id_location = db.Column(db.Integer, db.ForeignKey('Locations.id_location'), nullable=False)
+    # Materialized from Comment.rating_point, maintained by ratings.py
+    user_rating = db.Column(db.Float)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default=db.text('0'))
+    rating_sum = db.Column(db.Float, nullable=False, default=0, server_default=db.text('0'))
     location = db.relationship('Locations', backref='hotels')
     facilities = db.relationship('Facilities', secondary='Hotel_Facilities', backref='hotels')
     images = db.relationship('HotelImages', backref='hotel', cascade='all, delete-orphan')
     rooms = db.relationship('Hotel_Room', backref='hotel', cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='hotel', cascade='all, delete-orphan')
+    __table_args__ = (
+        db.Index('ix_hotel_location_user_rating', 'id_location', 'user_rating'),
+        # Listing sort keys; the implicit trailing rowid lets (sort key, id) keyset pages seek the index
+        db.Index('ix_hotel_location_hotel_name', 'id_location', 'hotel_name'),
+        db.Index('ix_hotel_location_new_price', 'id_location', 'new_price'),
+        db.Index('ix_hotel_location_old_price', 'id_location', 'old_price'),
+        db.Index('ix_hotel_location_hotel_star', 'id_location', 'hotel_star'),
+        db.Index('ix_hotel_location_hotel_rating', 'id_location', 'hotel_rating'),
+        db.Index('ix_hotel_location_distance_km', 'id_location', 'distance_km'),
+        # sort_by=distance orders on these expressions (see distance_sort_key)
+        db.Index('ix_hotel_location_distance_sort_asc', 'id_location',
+                 db.text(f'coalesce(distance_km, {UNKNOWN_DISTANCE_SQL[False]})')),
+        db.Index('ix_hotel_location_distance_sort_desc', 'id_location',
+                 db.text(f'coalesce(distance_km, {UNKNOWN_DISTANCE_SQL[True]})')),
+    )
 
 class HotelImages(db.Model):
     __tablename__ = 'Hotel_Images'
     id = db.Column(db.Integer, primary_key=True)
-    hotel_id = db.Column(db.Integer, db.ForeignKey('Hotel.id'), nullable=False)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('Hotel.id'), nullable=False, index=True)
     image_url = db.Column(db.String, nullable=False)
 
 class HotelFacilities(db.Model):
@@ -74,10 +99,14 @@ class Comment(db.Model):
     rating_point = db.Column(db.Float, nullable=False)
     comment = db.Column(db.String)
     image_url = db.Column(db.String)
-    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), nullable=False, index=True)
     hotel_id = db.Column(db.Integer, db.ForeignKey('Hotel.id'), nullable=False)
     images = db.relationship('CommentImages', backref='Comment', cascade='all, delete-orphan')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_comment_hotel_created_at', 'hotel_id', 'created_at'),
+        db.Index('ix_comment_hotel_rating_point', 'hotel_id', 'rating_point'),
+    )
 
 class Booking(db.Model):
     __tablename__ = 'Booking'
@@ -91,8 +120,22 @@ class Booking(db.Model):
     number_of_children = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_discount_id = db.Column(db.Integer, db.ForeignKey('user_discount.id'), nullable=True)
+    user_discount_id = db.Column(db.Integer, db.ForeignKey('user_discount.id'), nullable=True, index=True)
     room = db.relationship('Hotel_Room', backref='bookings')
+    nights = db.relationship('BookingNight', backref='booking', cascade='all, delete-orphan')
+    __table_args__ = (
+        # Also serves plain users_id lookups (booking history, user deletes)
+        db.Index('ix_booking_user_check_in', 'users_id', 'check_in'),
+        # A room's bookings, and its stays overlapping a date range
+        db.Index('ix_booking_room_stay', 'room_id', 'check_in', 'check_out'),
+    )
+
+class BookingNight(db.Model):
+    # One row per room per booked night; the primary key doubles as the availability index.
+    __tablename__ = 'Booking_Night'
+    room_id = db.Column(db.Integer, db.ForeignKey('Hotel_Room.id_hotel_room'), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('Booking.id'), nullable=False, index=True)
 
 class Hotel_Room(db.Model):
     __tablename__ = 'Hotel_Room'
@@ -100,18 +143,31 @@ class Hotel_Room(db.Model):
     room_number = db.Column(db.String, nullable=False)
     room_type = db.Column(db.String, nullable=False)
     hotel_id = db.Column(db.Integer, db.ForeignKey('Hotel.id'), nullable=False)
+    __table_args__ = (
+        # Also serves plain hotel_id lookups. Rooms of a hotel by type (available rooms, group bookings)
+        db.Index('ix_hotel_room_hotel_type', 'hotel_id', 'room_type'),
+    )
 
 class UserDiscount(db.Model):
     __tablename__ = 'user_discount'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), nullable=False)
-    discount_id = db.Column(db.Integer, db.ForeignKey('Discount.id'), nullable=False)
+    discount_id = db.Column(db.Integer, db.ForeignKey('Discount.id'), nullable=False, index=True)
     amount = db.Column(db.Integer, nullable=False)
     is_used = db.Column(db.Boolean, default=False)
     bookings = db.relationship('Booking', backref='user_discount', cascade='all, delete-orphan')
+    __table_args__ = (
+        db.Index('ix_user_discount_user_discount', 'user_id', 'discount_id'),
+    )
 
 class CommentImages(db.Model):
     __tablename__ = 'Comment_Images'
     id = db.Column(db.Integer, primary_key=True)
-    comment_id = db.Column(db.Integer, db.ForeignKey('Comment.id_comment'), nullable=False)
-    image_url = db.Column(db.String, nullable=False)
\ No newline at end of file
+    comment_id = db.Column(db.Integer, db.ForeignKey('Comment.id_comment'), nullable=False, index=True)
+    image_url = db.Column(db.String, nullable=False)
+
+def distance_sort_key(descending):
+    # Hotels whose text gives a distance to a landmark have no distance_km; this key keeps them,
+    # last in either direction, with a non-NULL value that cursors can seek past
+    unknown = db.literal_column(UNKNOWN_DISTANCE_SQL[descending], db.Float)
+    return db.func.coalesce(Hotel.distance_km, unknown).label('distance_sort')
@@ -0,0 +1,120 @@
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import asc, desc, literal, tuple_
+
+# Keyset (cursor) pagination: pages are fetched by seeking past the (sort key, id) of the
+# last row seen, so page N costs the same index seek as page 1 and no COUNT(*) is needed.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _from_json(value, column):
+    # Dates travel as ISO strings and are bound with the column's own type
+    expression = column.expression
+    if isinstance(value, str):
+        try:
+            python_type = expression.type.python_type
+        except NotImplementedError:
+            python_type = None
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is date:
+            value = date.fromisoformat(value)
+    return literal(value, expression.type)
+
+
+def encode_cursor(key, direction='next'):
+    payload = json.dumps({'k': [_to_json(value) for value in key], 'd': direction}, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        key, direction = payload['k'], payload['d']
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(key, list) or direction not in ('next', 'prev'):
+        raise InvalidCursor('Invalid cursor')
+    return key, direction
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.has_next = next_cursor is not None
+        self.has_prev = prev_cursor is not None
+        self.total = total
+
+    def to_dict(self):
+        info = {
+            'per_page': self.per_page,
+            'has_next': self.has_next,
+            'has_prev': self.has_prev,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor
+        }
+        if self.total is not None:
+            info['total'] = self.total
+        return info
+
+
+def keyset_paginate(query, columns, per_page, cursor=None, descending=False, with_total=False,
+                    key=None):
+    """Return one KeysetPage of `query` ordered by `columns`.
+
+    `columns` must end with a unique column (normally the primary key) so the ordering is total.
+    `key` maps a result row to its values for `columns`; by default the attributes of the row
+    with the columns' names are used.
+    """
+    if key is None:
+        names = [column.key for column in columns]
+        key = lambda row: [getattr(row, name) for name in names]
+
+    total = query.order_by(None).count() if with_total else None
+
+    direction = 'next'
+    if cursor:
+        values, direction = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise InvalidCursor('Invalid cursor')
+        try:
+            values = [_from_json(value, column) for value, column in zip(values, columns)]
+        except ValueError:
+            raise InvalidCursor('Invalid cursor')
+        # Walking backwards flips the comparison and the ordering; rows are reversed afterwards
+        forward = (direction == 'next') != descending
+        position = tuple_(*columns)
+        query = query.filter(position > tuple_(*values) if forward else position < tuple_(*values))
+        # Implied by the row comparison, but SQLite only turns this form into an index range
+        # when the leading column is an expression (e.g. the distance sort key)
+        query = query.filter(columns[0] >= values[0] if forward else columns[0] <= values[0])
+
+    reverse = (direction == 'prev') != descending
+    order = desc if reverse else asc
+    rows = query.order_by(None).order_by(*[order(column) for column in columns]).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    if direction == 'next':
+        has_next, has_prev = has_more, cursor is not None
+    else:
+        has_next, has_prev = True, has_more
+
+    next_cursor = encode_cursor(key(rows[-1]), 'next') if has_next and rows else None
+    prev_cursor = encode_cursor(key(rows[0]), 'prev') if has_prev and rows else None
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor, total)
@@ -0,0 +1,104 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+from metrics import metrics
+
+# bcrypt runs in a bounded process pool so a burst of logins cannot pin every request
+# worker on hashing. Config:
+#   BCRYPT_LOG_ROUNDS             cost for new hashes (default 12, same as flask_bcrypt)
+#   PASSWORD_HASH_WORKERS         pool processes (default: CPU count; 0 hashes inline)
+#   PASSWORD_HASH_QUEUE_SIZE      hashes allowed in flight or queued (default: 4 x workers)
+#   PASSWORD_HASH_QUEUE_TIMEOUT   seconds to wait for a queue slot before giving up (default 5)
+DEFAULT_LOG_ROUNDS = 12
+_COST = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def _to_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+class PasswordHasher:
+
+    def __init__(self):
+        self.rounds = DEFAULT_LOG_ROUNDS
+        self.workers = os.cpu_count() or 1
+        self.queue_size = self.workers * 4
+        self.queue_timeout = 5.0
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        metrics.register_gauge('password_hash_pool', self.stats)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', DEFAULT_LOG_ROUNDS)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE_SIZE', max(1, self.workers) * 4)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0)
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+
+    def _pool(self):
+        # Created on first use so the worker processes are not forked before the app is configured
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _run(self, name, fn, *args):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            metrics.increment('password_hash.rejected')
+            raise PasswordHasherBusy('Too many password operations in progress, please retry')
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            if self.workers:
+                result = self._pool().submit(fn, *args).result()
+            else:
+                result = fn(*args)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            self._slots.release()
+        metrics.observe(f'password_hash.{name}', time.perf_counter() - started)
+        return result
+
+    def generate(self, password):
+        return self._run('generate', _hash_password, _to_bytes(password), self.rounds)
+
+    def check(self, hashed, password):
+        return self._run('check', _check_password, _to_bytes(password), _to_bytes(hashed))
+
+    def needs_rehash(self, hashed):
+        match = _COST.match(hashed or '')
+        return match is not None and int(match.group(1)) != self.rounds
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'in_flight': self._in_flight,
+            'saturation': self._in_flight / self.queue_size if self.queue_size else 0.0,
+            'log_rounds': self.rounds
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,36 @@
+from sqlalchemy import func, select, update
+from extensions import db
+from models import Comment, Hotel
+
+
+def record_comment_rating(hotel_id, rating_point):
+    # Fold a new comment into the hotel's aggregates; SQLite evaluates every SET against the old row
+    db.session.execute(
+        update(Hotel).where(Hotel.id == hotel_id).values(
+            comment_count=Hotel.comment_count + 1,
+            rating_sum=Hotel.rating_sum + rating_point,
+            user_rating=(Hotel.rating_sum + rating_point) / (Hotel.comment_count + 1)
+        )
+    )
+
+
+def refresh_hotel_ratings(hotel_ids=None):
+    # Recompute the aggregates from Comment, for all hotels or only the given ones
+    def per_hotel(aggregate):
+        return select(aggregate).where(Comment.hotel_id == Hotel.id).scalar_subquery()
+
+    statement = update(Hotel).values(
+        comment_count=per_hotel(func.count(Comment.id_comment)),
+        rating_sum=per_hotel(func.coalesce(func.sum(Comment.rating_point), 0)),
+        user_rating=per_hotel(func.avg(Comment.rating_point))
+    )
+    if hotel_ids is not None:
+        if not hotel_ids:
+            return
+        statement = statement.where(Hotel.id.in_(hotel_ids))
+    db.session.execute(statement.execution_options(synchronize_session=False))
+
+
+def rebuild_hotel_ratings():
+    refresh_hotel_ratings()
+    db.session.commit()
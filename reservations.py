@@ -0,0 +1,175 @@
+import random
+import time
+
+from flask import current_app
+from sqlalchemy import func, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from availability import available_rooms_query, is_room_available, reserve_nights
+from extensions import db
+from metrics import metrics
+from models import Booking, Hotel_Room, UserDiscount, Users
+
+# Booking writes run in a write-locked transaction so concurrent requests serialize on the
+# database instead of racing in Python:
+#   - SQLite takes the write lock up front (BEGIN IMMEDIATE), so the availability check and
+#     the insert see the same state; the Booking_Night primary key rejects any overlap that
+#     slips past it, e.g. from a writer outside this path.
+#   - Discounts and points change with compare-and-swap UPDATEs rather than read-modify-write.
+#   - Lock timeouts ("database is locked") are retried a bounded number of times.
+# Config: BOOKING_MAX_ATTEMPTS (default 3), BOOKING_RETRY_BACKOFF (seconds, default 0.05).
+BOOKING_POINTS = 10
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 0.05
+
+
+class BookingConflict(Exception):
+    pass
+
+
+class DiscountUnavailable(Exception):
+    pass
+
+
+class BookingBusy(Exception):
+    pass
+
+
+class UnknownUser(Exception):
+    pass
+
+
+def _is_lock_error(error):
+    message = str(error.orig).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def _is_night_conflict(error):
+    return 'Booking_Night' in str(error.orig)
+
+
+def _begin_immediate():
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        return
+    # pysqlite only opens a transaction before DML; take the write lock before the first read
+    if not connection.connection.driver_connection.in_transaction:
+        connection.execute(text('BEGIN IMMEDIATE'))
+
+
+def run_booking_transaction(work, max_attempts=None, backoff=None):
+    # Runs work() inside a write-locked transaction and commits it. work() must be safe to
+    # call again: it runs from scratch after a lock timeout.
+    config = current_app.config
+    max_attempts = max_attempts or config.get('BOOKING_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    backoff = config.get('BOOKING_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF) if backoff is None else backoff
+
+    for attempt in range(1, max_attempts + 1):
+        started = time.perf_counter()
+        try:
+            _begin_immediate()
+            result = work()
+            db.session.commit()
+            metrics.observe('booking.commit', time.perf_counter() - started)
+            metrics.increment('booking.committed')
+            return result
+        except IntegrityError as e:
+            db.session.rollback()
+            if _is_night_conflict(e):
+                metrics.increment('booking.conflict')
+                raise BookingConflict('Room not available') from e
+            raise
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_lock_error(e):
+                raise
+            metrics.increment('booking.lock_retry')
+            if attempt == max_attempts:
+                raise BookingBusy('The booking service is busy, please retry') from e
+            time.sleep(backoff * attempt * (1 + random.random()))
+        except (BookingConflict, DiscountUnavailable):
+            db.session.rollback()
+            metrics.increment('booking.conflict')
+            raise
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def redeem_discount(user_discount_id, user_id, uses=1):
+    # Compare-and-swap: only succeeds while the user still holds enough uses
+    result = db.session.execute(
+        update(UserDiscount)
+        .where(
+            UserDiscount.id == user_discount_id,
+            UserDiscount.user_id == user_id,
+            UserDiscount.amount >= uses
+        )
+        .values(amount=UserDiscount.amount - uses)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise DiscountUnavailable('Invalid or expired discount')
+
+
+def award_points(user_id, points):
+    # The token may outlive the user (the identity cache is per process): no row means no booking
+    user_points = db.session.execute(
+        update(Users)
+        .where(Users.id == user_id)
+        .values(point=func.coalesce(Users.point, 0) + points)
+        .returning(Users.point)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if user_points is None:
+        raise UnknownUser('User not found')
+    return user_points
+
+
+def add_booking(**fields):
+    # Checked under the write lock; the Booking_Night primary key still backs it up
+    if not is_room_available(fields['room_id'], fields['check_in'], fields['check_out']):
+        raise BookingConflict('Room not available')
+    booking = Booking(**fields)
+    reserve_nights(booking)
+    db.session.add(booking)
+    return booking
+
+
+def place_booking(user_id, user_discount_id=None, **fields):
+    # Returns (booking, user_points) once the booking, discount use and points are committed
+    def work():
+        if user_discount_id:
+            redeem_discount(user_discount_id, user_id)
+        booking = add_booking(users_id=user_id, user_discount_id=user_discount_id, **fields)
+        db.session.flush()
+        return booking, award_points(user_id, BOOKING_POINTS)
+
+    return run_booking_transaction(work)
+
+
+def place_group_booking(user_id, hotel_id, room_type, count, check_in, check_out, user_discount_id=None, **fields):
+    # Allocates `count` free rooms and books them all or none; the discount is used and the
+    # points are earned once per room. Returns (allocations, user_points), read before the
+    # commit expires the objects.
+    def work():
+        rooms = available_rooms_query(hotel_id, check_in, check_out, room_type).order_by(
+            Hotel_Room.id_hotel_room
+        ).limit(count).all()
+        if len(rooms) < count:
+            raise BookingConflict(f'Only {len(rooms)} {room_type} rooms available for these dates')
+        if user_discount_id:
+            redeem_discount(user_discount_id, user_id, uses=count)
+        bookings = [
+            add_booking(room_id=room.id_hotel_room, users_id=user_id, check_in=check_in, check_out=check_out,
+                        user_discount_id=user_discount_id, **fields)
+            for room in rooms
+        ]
+        db.session.flush()
+        allocations = [
+            {'booking_id': booking.id, 'room_id': room.id_hotel_room, 'room_number': room.room_number}
+            for booking, room in zip(bookings, rooms)
+        ]
+        return allocations, award_points(user_id, BOOKING_POINTS * count)
+
+    return run_booking_transaction(work)
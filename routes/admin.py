@@ -1,16 +1,23 @@
 from flask import Blueprint, render_template, request, redirect, url_for
 from extensions import db
-from models import Discount, Hotel, Locations, Users, Comment, Hotel_Room, Booking
-from sqlalchemy.sql import func
+from models import Discount, Hotel, Locations, Users, Hotel_Room, Booking
+from ratings import refresh_hotel_ratings
+from pagination import InvalidCursor, keyset_paginate
+from search import index_hotels, remove_hotels
+from import_data import parse_distance_km
+from facility_index import facility_index
 from datetime import datetime
 from urllib.parse import urlencode
 
 admin = Blueprint('admin', __name__, template_folder='templates')
 
 
-# Helper function for pagination
-def paginate_query(query, page, per_page=10):
-    return query.paginate(page=page, per_page=per_page, error_out=False)
+# Helper function for pagination: keyset pages on the primary key, no COUNT(*)
+def paginate_query(query, id_column, per_page=10):
+    try:
+        return keyset_paginate(query, [id_column], per_page, cursor=request.args.get('cursor'))
+    except InvalidCursor:
+        return keyset_paginate(query, [id_column], per_page)
 
 
 @admin.route('/')
@@ -28,7 +35,6 @@ def show_message():
 
 @admin.route('/hotels', methods=['GET', 'POST'])
 def manage_hotels():
-    page = request.args.get('page', 1, type=int)
     if request.method == 'POST':
         try:
             hotel = Hotel(
@@ -41,10 +47,14 @@ def manage_hotels():
                 policies=request.form['policies'],
                 description=request.form['description'],
                 distance=request.form['distance'],
+                distance_km=parse_distance_km(request.form['distance']),
                 id_location=int(request.form['id_location'])
             )
             db.session.add(hotel)
+            db.session.flush()
+            index_hotels([hotel.id])
             db.session.commit()
+            facility_index.add_hotels([hotel.id])
             return redirect(url_for('admin.show_message',
                                     message='Hotel added successfully!',
                                     status='success',
@@ -56,13 +66,8 @@ def manage_hotels():
                                     status='error',
                                     back_url=url_for('admin.manage_hotels')))
 
-    # Query hotels with their average user rating
-    hotels = paginate_query(Hotel.query, page)
-
-    # Calculate user_rating for each hotel
-    for hotel in hotels.items:
-        avg_rating = db.session.query(func.avg(Comment.rating_point)).filter(Comment.hotel_id == hotel.id).scalar()
-        hotel.user_rating = float(avg_rating) if avg_rating else None
+    # user_rating is materialized on the hotel row
+    hotels = paginate_query(Hotel.query, Hotel.id)
 
     locations = Locations.query.all()
     return render_template('admin_hotels.html', hotels=hotels, locations=locations)
@@ -71,9 +76,6 @@ def manage_hotels():
 @admin.route('/hotels/<int:id>')
 def hotel_detail(id):
     hotel = Hotel.query.get_or_404(id)
-    # Calculate user_rating
-    avg_rating = db.session.query(func.avg(Comment.rating_point)).filter(Comment.hotel_id == hotel.id).scalar()
-    hotel.user_rating = float(avg_rating) if avg_rating else None
     # Fetch bookings for this hotel
     hotel_bookings = Booking.query.join(Hotel_Room).filter(Hotel_Room.hotel_id == hotel.id).all()
     return render_template('admin_hotel_detail.html', hotel=hotel, hotel_bookings=hotel_bookings)
@@ -107,7 +109,9 @@ def delete_hotel(id):
     hotel = Hotel.query.get_or_404(id)
     try:
         db.session.delete(hotel)
+        remove_hotels([id])
         db.session.commit()
+        facility_index.remove_hotels([id])
         return redirect(url_for('admin.show_message',
                                 message='Hotel deleted successfully!',
                                 status='success',
@@ -122,7 +126,6 @@ def delete_hotel(id):
 
 @admin.route('/discounts', methods=['GET', 'POST'])
 def manage_discounts():
-    page = request.args.get('page', 1, type=int)
     if request.method == 'POST':
         try:
             discount = Discount(
@@ -144,7 +147,7 @@ def manage_discounts():
                                     status='error',
                                     back_url=url_for('admin.manage_discounts')))
 
-    discounts = paginate_query(Discount.query, page)
+    discounts = paginate_query(Discount.query, Discount.id)
     return render_template('admin_discounts.html', discounts=discounts)
 
 
@@ -168,7 +171,6 @@ def delete_discount(id):
 
 @admin.route('/locations', methods=['GET', 'POST'])
 def manage_locations():
-    page = request.args.get('page', 1, type=int)
     if request.method == 'POST':
         try:
             location = Locations(
@@ -189,7 +191,7 @@ def manage_locations():
                                     status='error',
                                     back_url=url_for('admin.manage_locations')))
 
-    locations = paginate_query(Locations.query, page)
+    locations = paginate_query(Locations.query, Locations.id_location)
     return render_template('admin_locations.html', locations=locations)
 
 
@@ -213,7 +215,6 @@ def delete_location(id):
 
 @admin.route('/users', methods=['GET', 'POST'])
 def manage_users():
-    page = request.args.get('page', 1, type=int)
     if request.method == 'POST':
         try:
             date_of_birth_str = request.form['date_of_birth']
@@ -241,7 +242,7 @@ def manage_users():
                                     status='error',
                                     back_url=url_for('admin.manage_users')))
 
-    users = paginate_query(Users.query, page)
+    users = paginate_query(Users.query, Users.id)
     return render_template('admin_users.html', users=users)
 
 
@@ -249,7 +250,11 @@ def manage_users():
 def delete_user(id):
     user = Users.query.get_or_404(id)
     try:
+        # The user's comments are cascaded away, so re-aggregate the hotels they rated
+        rated_hotel_ids = {comment.hotel_id for comment in user.comments}
         db.session.delete(user)
+        db.session.flush()
+        refresh_hotel_ratings(rated_hotel_ids)
         db.session.commit()
         return redirect(url_for('admin.show_message',
                                 message='User deleted successfully!',
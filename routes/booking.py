@@ -1,20 +1,26 @@
+from collections import Counter
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models import Hotel_Room, Booking, Users, Hotel, UserDiscount
-from datetime import datetime
+from models import Hotel_Room, Booking, Hotel, UserDiscount, Discount
+from datetime import date, datetime
 from sqlalchemy import and_, not_
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
+from availability import available_rooms_query
+from reservations import (BookingBusy, BookingConflict, DiscountUnavailable, UnknownUser, place_booking,
+                          place_group_booking)
+from identity import user_not_found
+from pagination import InvalidCursor, keyset_paginate
 
 booking = Blueprint('booking', __name__, url_prefix='/')
 
+VALID_HISTORY_FILTERS = ['all', 'upcoming', 'past']
+MAX_BATCH_ROOMS = 20
+MAX_QUOTE_ITEMS = 1000
+
 @booking.route('/available-rooms', methods=['GET'])
 @jwt_required()
 def get_available_rooms():
     try:
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({'status': 'error', 'message': 'User not found'}), 404
 
         hotel_id = request.args.get('hotel_id', type=int)
         check_in_str = request.args.get('check_in')
@@ -34,20 +40,7 @@ def get_available_rooms():
         if not hotel:
             return jsonify({'status': 'error', 'message': 'Hotel not found'}), 404
 
-        booked_rooms = db.session.query(Booking.room_id).filter(
-            Booking.room_id.in_(
-                db.session.query(Hotel_Room.id_hotel_room).filter(Hotel_Room.hotel_id == hotel_id)
-            ),
-            Booking.check_out > check_in,
-            Booking.check_in < check_out
-        ).distinct()
-
-        query = Hotel_Room.query.filter(
-            Hotel_Room.hotel_id == hotel_id,
-            ~Hotel_Room.id_hotel_room.in_(booked_rooms)
-        )
-        if room_type:
-            query = query.filter(Hotel_Room.room_type == room_type)
+        query = available_rooms_query(hotel_id, check_in, check_out, room_type)
 
         rooms = [{
             'id_hotel_room': room.id_hotel_room,
@@ -66,10 +59,7 @@ def get_available_rooms():
 @jwt_required()
 def create_booking():
     try:
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({'status': 'error', 'message': 'User not found'}), 404
+        user = current_user
 
         data = request.get_json()
         required = ['room_id', 'check_in', 'check_out', 'number_of_people', 'number_of_rooms', 'number_of_children']
@@ -79,7 +69,6 @@ def create_booking():
         room_id = data['room_id']
         check_in = datetime.strptime(data['check_in'], '%Y-%m-%d').date()
         check_out = datetime.strptime(data['check_out'], '%Y-%m-%d').date()
-        print(check_in, check_out)
         if check_in >= check_out:
             return jsonify({'status': 'error', 'message': 'Invalid dates'}), 400
 
@@ -110,8 +99,6 @@ def create_booking():
             discount_value = discount.discount_value
             final_price = max(0, base_price * (1 - discount_value / 100))
 
-            user_discount.amount -= 1
-
             discount_info = {
                 'discount_id': discount.id,
                 'discount_name': discount.discount_name,
@@ -120,35 +107,31 @@ def create_booking():
                 'point_required': discount.point_required
             }
 
-        # Check room availability
-        conflicts = Booking.query.filter(
-            Booking.room_id == room_id,
-            Booking.check_out > check_in,
-            Booking.check_in < check_out
-        ).count()
-        print(conflicts)
-        if conflicts > 0:
-            return jsonify({'status': 'error', 'message': 'Room not available'}), 409
-
-        booking = Booking(
-            room_id=room_id,
-            users_id=user.id,
-            check_in=check_in,
-            check_out=check_out,
-            number_of_people=data['number_of_people'],
-            number_of_rooms=data['number_of_rooms'],
-            number_of_children=data['number_of_children'],
-            price=final_price,
-            user_discount_id=user_discount_id
-        )
-
-        user.point += 10
-        db.session.add(booking)
-        db.session.commit()
+        # Availability, the discount use and the points are settled atomically in reservations.py
+        try:
+            booking, user_points = place_booking(
+                user.id,
+                user_discount_id=user_discount_id,
+                room_id=room_id,
+                check_in=check_in,
+                check_out=check_out,
+                number_of_people=data['number_of_people'],
+                number_of_rooms=data['number_of_rooms'],
+                number_of_children=data['number_of_children'],
+                price=final_price
+            )
+        except BookingConflict as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 409
+        except DiscountUnavailable as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except BookingBusy as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 503
+        except UnknownUser:
+            return user_not_found()
 
         return jsonify({'status': 'success', 'message': 'Booking created', 'data': {
             'booking_id': booking.id,
-            'user_points': user.point,
+            'user_points': user_points,
             'hotel_info': {
                 'hotel_id': hotel.id,
                 'hotel_name': hotel.hotel_name,
@@ -183,14 +166,88 @@ def create_booking():
 
 
 
+@booking.route('/bookings/batch', methods=['POST'])
+@jwt_required()
+def create_batch_booking():
+    try:
+        user = current_user
+
+        # number_of_people and number_of_children are per room
+        data = request.get_json()
+        required = ['hotel_id', 'room_type', 'count', 'check_in', 'check_out', 'number_of_people', 'number_of_children']
+        if not data or not all(k in data for k in required):
+            return jsonify({'status': 'error', 'message': 'Missing required fields'}), 400
+
+        count = data['count']
+        if type(count) is not int or not 1 <= count <= MAX_BATCH_ROOMS:
+            return jsonify({'status': 'error', 'message': f'count must be an integer between 1 and {MAX_BATCH_ROOMS}'}), 400
+
+        check_in = datetime.strptime(data['check_in'], '%Y-%m-%d').date()
+        check_out = datetime.strptime(data['check_out'], '%Y-%m-%d').date()
+        if check_in >= check_out:
+            return jsonify({'status': 'error', 'message': 'Invalid dates'}), 400
+
+        hotel = Hotel.query.get(data['hotel_id'])
+        if not hotel:
+            return jsonify({'status': 'error', 'message': 'Hotel not found'}), 404
+
+        num_days = (check_out - check_in).days
+        daily_price = hotel.new_price
+        base_price = num_days * daily_price
+
+        discount_value = 0
+        final_price = base_price
+        user_discount_id = data.get('user_discount_id')
+        if user_discount_id:
+            user_discount = UserDiscount.query.get(user_discount_id)
+            if not user_discount or user_discount.user_id != user.id or user_discount.amount < count:
+                return jsonify({'status': 'error', 'message': 'Invalid or expired discount'}), 400
+            discount_value = user_discount.discount.discount_value
+            final_price = max(0, base_price * (1 - discount_value / 100))
+
+        # Rooms are allocated and booked in one transaction: either every room is booked or none
+        try:
+            allocations, user_points = place_group_booking(
+                user.id, hotel.id, data['room_type'], count, check_in, check_out,
+                user_discount_id=user_discount_id,
+                number_of_people=data['number_of_people'],
+                number_of_rooms=1,
+                number_of_children=data['number_of_children'],
+                price=final_price
+            )
+        except BookingConflict as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 409
+        except DiscountUnavailable as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except BookingBusy as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 503
+        except UnknownUser:
+            return user_not_found()
+
+        return jsonify({'status': 'success', 'message': 'Bookings created', 'data': {
+            'user_points': user_points,
+            'hotel_id': hotel.id,
+            'room_type': data['room_type'],
+            'check_in': data['check_in'],
+            'check_out': data['check_out'],
+            'num_days': num_days,
+            'daily_price': daily_price,
+            'discount_value': discount_value,
+            'price_per_room': final_price,
+            'total_price': final_price * count,
+            'bookings': allocations
+        }}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
 @booking.route('/calculate-price', methods=['POST'])
 @jwt_required()
 def calculate_price():
     try:
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({'status': 'error', 'message': 'User not found'}), 404
+        user = current_user
 
         data = request.get_json()
         required = ['room_id', 'check_in', 'check_out']
@@ -234,22 +291,154 @@ def calculate_price():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@booking.route('/calculate-price/batch', methods=['POST'])
+@jwt_required()
+def calculate_prices():
+    try:
+        user = current_user
+
+        # items: [{key?, room_id, check_in, check_out, user_discount_id?}]; results are keyed by
+        # each item's key, or by its position when no key is given, and keys must be unique
+        data = request.get_json()
+        items = data.get('items') if data else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'status': 'error', 'message': 'items must be a non-empty list'}), 400
+        if len(items) > MAX_QUOTE_ITEMS:
+            return jsonify({'status': 'error', 'message': f'At most {MAX_QUOTE_ITEMS} items per request'}), 400
+
+        # Every item needs its own key; a repeated one would silently overwrite an earlier result
+        keys = [str(item.get('key', position)) if isinstance(item, dict) else str(position)
+                for position, item in enumerate(items)]
+        duplicates = sorted(key for key, seen in Counter(keys).items() if seen > 1)
+        if duplicates:
+            return jsonify({'status': 'error', 'message': f'Duplicate item keys: {duplicates}'}), 400
+
+        # Validate every item before the lookups, so one malformed item fails alone
+        results = dict.fromkeys(keys)
+        quotes = []
+        for key, item in zip(keys, items):
+            if not isinstance(item, dict) or not all(k in item for k in ['room_id', 'check_in', 'check_out']):
+                results[key] = {'status': 'error', 'message': 'Missing required fields'}
+                continue
+            if type(item['room_id']) is not int:
+                results[key] = {'status': 'error', 'message': 'room_id must be an integer'}
+                continue
+            user_discount_id = item.get('user_discount_id')
+            if user_discount_id is not None and type(user_discount_id) is not int:
+                results[key] = {'status': 'error', 'message': 'user_discount_id must be an integer'}
+                continue
+            try:
+                check_in = datetime.strptime(item['check_in'], '%Y-%m-%d').date()
+                check_out = datetime.strptime(item['check_out'], '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                results[key] = {'status': 'error', 'message': 'Invalid dates'}
+                continue
+            if check_in >= check_out:
+                results[key] = {'status': 'error', 'message': 'Invalid dates'}
+                continue
+            quotes.append((key, item, check_in, check_out))
+
+        # Rooms with their nightly price and the caller's discounts, one query each for the whole batch
+        rooms = {}
+        room_ids = {item['room_id'] for _, item, _, _ in quotes}
+        if room_ids:
+            rooms = {
+                row.id_hotel_room: row for row in db.session.query(
+                    Hotel_Room.id_hotel_room, Hotel_Room.hotel_id, Hotel_Room.room_type, Hotel.new_price
+                ).join(Hotel, Hotel.id == Hotel_Room.hotel_id).filter(Hotel_Room.id_hotel_room.in_(room_ids))
+            }
+        discount_ids = {item.get('user_discount_id') for _, item, _, _ in quotes} - {None}
+        discounts = {}
+        if discount_ids:
+            discounts = dict(db.session.query(UserDiscount.id, Discount.discount_value).join(
+                Discount, Discount.id == UserDiscount.discount_id
+            ).filter(UserDiscount.id.in_(discount_ids), UserDiscount.user_id == user.id).all())
+
+        for key, item, check_in, check_out in quotes:
+            room = rooms.get(item['room_id'])
+            if not room:
+                results[key] = {'status': 'error', 'message': 'Room not found'}
+                continue
+            user_discount_id = item.get('user_discount_id')
+            if user_discount_id and user_discount_id not in discounts:
+                results[key] = {'status': 'error', 'message': 'Invalid discount'}
+                continue
+
+            num_days = (check_out - check_in).days
+            price = num_days * room.new_price
+            discount_value = discounts.get(user_discount_id, 0) if user_discount_id else 0
+            if discount_value:
+                price = max(0, price * (1 - discount_value / 100))
+            results[key] = {
+                'status': 'success',
+                'room_id': room.id_hotel_room,
+                'hotel_id': room.hotel_id,
+                'room_type': room.room_type,
+                'check_in': item['check_in'],
+                'check_out': item['check_out'],
+                'num_days': num_days,
+                'daily_price': room.new_price,
+                'discount_value': discount_value,
+                'total_price': price
+            }
+
+        return jsonify({'status': 'success', 'message': 'Prices calculated', 'data': results}), 200
+
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @booking.route('/booking-history', methods=['GET'])
 @jwt_required()
 def booking_history():
     try:
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({'status': 'error', 'message': 'User not found'}), 404
-
-        bookings = Booking.query.filter_by(users_id=user.id).order_by(Booking.check_in.desc()).all()
+        user = current_user
+
+        # filter=upcoming|past|all; paging=cursor or a cursor argument returns keyset pages
+        status_filter = request.args.get('filter', 'all').lower()
+        cursor = request.args.get('cursor')
+        keyset = request.args.get('paging', '').lower() == 'cursor' or cursor is not None
+        per_page = request.args.get('per_page', 10, type=int)
+
+        if status_filter not in VALID_HISTORY_FILTERS:
+            return jsonify({'status': 'error', 'message': f'Invalid filter. Must be one of {VALID_HISTORY_FILTERS}'}), 400
+        if keyset and per_page < 1:
+            return jsonify({'status': 'error', 'message': 'per_page must be a positive integer'}), 400
+
+        # One joined query projecting only the columns in the response, served by (users_id, check_in)
+        query = db.session.query(
+            Booking.id, Booking.check_in, Booking.check_out, Booking.number_of_people,
+            Booking.number_of_children, Booking.number_of_rooms, Booking.price, Booking.created_at,
+            Hotel_Room.id_hotel_room, Hotel_Room.room_number, Hotel_Room.room_type,
+            Hotel.id.label('hotel_id'), Hotel.hotel_name, Hotel.address, Hotel.hotel_star, Hotel.description
+        ).join(
+            Hotel_Room, Hotel_Room.id_hotel_room == Booking.room_id
+        ).join(
+            Hotel, Hotel.id == Hotel_Room.hotel_id
+        ).filter(Booking.users_id == user.id)
+
+        today = date.today()
+        descending = True
+        if status_filter == 'upcoming':
+            query = query.filter(Booking.check_in >= today)
+            descending = False
+        elif status_filter == 'past':
+            query = query.filter(Booking.check_in < today)
+
+        pagination_info = None
+        if keyset:
+            try:
+                page = keyset_paginate(query, [Booking.check_in, Booking.id], per_page,
+                                       cursor=cursor, descending=descending)
+            except InvalidCursor as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            bookings = page.items
+            pagination_info = page.to_dict()
+        else:
+            order = Booking.check_in.desc() if descending else Booking.check_in.asc()
+            bookings = query.order_by(order, Booking.id.desc() if descending else Booking.id.asc()).all()
 
         history = []
         for b in bookings:
-            room = Hotel_Room.query.get(b.room_id)
-            hotel = room.hotel
-
             history.append({
                 'booking_id': b.id,
                 'check_in': b.check_in.strftime('%Y-%m-%d'),
@@ -259,21 +448,24 @@ def booking_history():
                 'number_of_rooms': b.number_of_rooms,
                 'price': b.price,
                 'room_info': {
-                    'room_id': room.id_hotel_room,
-                    'room_number': room.room_number,
-                    'room_type': room.room_type
+                    'room_id': b.id_hotel_room,
+                    'room_number': b.room_number,
+                    'room_type': b.room_type
                 },
                 'hotel_info': {
-                    'hotel_id': hotel.id,
-                    'hotel_name': hotel.hotel_name,
-                    'address': hotel.address,
-                    'star': hotel.hotel_star,
-                    'description': hotel.description
+                    'hotel_id': b.hotel_id,
+                    'hotel_name': b.hotel_name,
+                    'address': b.address,
+                    'star': b.hotel_star,
+                    'description': b.description
                 },
                 'created_at': b.created_at.strftime('%Y-%m-%dT%H:%M:%SZ')
             })
 
-        return jsonify({'status': 'success', 'message': 'Booking history retrieved', 'data': history}), 200
+        response = {'status': 'success', 'message': 'Booking history retrieved', 'data': history}
+        if pagination_info is not None:
+            response['pagination'] = pagination_info
+        return jsonify(response), 200
 
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
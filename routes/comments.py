@@ -1,11 +1,14 @@
 from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from models import Comment, Hotel, Users, CommentImages, Booking, Hotel_Room
 from extensions import db
+from ratings import record_comment_rating
 from sqlalchemy.exc import IntegrityError
-import os
-from werkzeug.utils import secure_filename
-from datetime import datetime
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from pagination import InvalidCursor, keyset_paginate
+from serializers import InvalidFieldset, parse_fieldset
+from media import UploadError, media_store
+from identity import current_user_row, user_not_found
 import logging
 
 # Configure logging
@@ -14,16 +17,31 @@ logger = logging.getLogger(__name__)
 
 comments_bp = Blueprint('comments', __name__)
 
-# Configuration for file uploads
-UPLOAD_FOLDER = 'static/uploads'
+# Configuration for file uploads; files are stored by media.py
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_IMAGES = 3
-
-# Ensure upload folder exists
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-    logger.info(f"Created upload folder: {UPLOAD_FOLDER}")
+# Comment feeds are always paged; paging=false (the old unpaged feed) is rejected
+COMMENTS_PER_PAGE = 20
+MAX_COMMENTS_PER_PAGE = 100
+
+# sortType -> (keyset column, descending); backed by the (hotel_id, column) indexes
+SORT_KEYS = {
+    'oldest': (Comment.created_at, False),
+    'newest': (Comment.created_at, True),
+    'lowest': (Comment.rating_point, False),
+    'highest': (Comment.rating_point, True)
+}
+
+# Comment feed output field -> column; 'user' and 'images' are relationships
+COMMENT_COLUMN_FIELDS = {
+    'id_comment': Comment.id_comment,
+    'rating_point': Comment.rating_point,
+    'comment': Comment.comment,
+    'hotel_id': Comment.hotel_id,
+    'created_at': Comment.created_at
+}
+COMMENT_FIELDS = list(COMMENT_COLUMN_FIELDS) + ['user', 'images']
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -31,22 +49,17 @@ def allowed_file(filename):
 @comments_bp.route('/comments', methods=['POST'])
 @jwt_required()
 def create_comment():
+    stored_images = []
     try:
         # Log incoming request
         logger.debug(f"Form data: {request.form}")
         logger.debug(f"Files: {request.files}")
 
-        # Get the authenticated user's email from JWT
-        email = get_jwt_identity()
-        logger.debug(f"JWT identity: {email}")
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            logger.error("User not found")
-            return jsonify({
-                'status': 'error',
-                'message': 'User not found',
-                'data': None
-            }), 404
+        # The authenticated user's row; a token can outlive the user in another worker's cache
+        user = current_user_row()
+        if user is None:
+            return user_not_found()
+        logger.debug(f"JWT identity: {user.email}")
 
         # Check if form data is present
         if not request.form:
@@ -155,18 +168,6 @@ def create_comment():
                     'data': None
                 }), 400
 
-            # Validate file size
-            image_file.seek(0, os.SEEK_END)
-            file_size = image_file.tell()
-            if file_size > MAX_FILE_SIZE:
-                logger.error(f"File too large: {file_size} bytes")
-                return jsonify({
-                    'status': 'error',
-                    'message': f'Image file size exceeds {MAX_FILE_SIZE / (1024 * 1024)}MB',
-                    'data': None
-                }), 400
-            image_file.seek(0)  # Reset file pointer
-
             # Validate file type
             if not allowed_file(image_file.filename):
                 logger.error(f"Invalid file type: {image_file.filename}")
@@ -176,16 +177,22 @@ def create_comment():
                     'data': None
                 }), 400
 
-            # Generate a unique filename
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
-            filename = secure_filename(image_file.filename)
-            unique_filename = f"{timestamp}_{filename}"
-            file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-
-            # Save the file
-            logger.debug(f"Saving file to: {file_path}")
-            image_file.save(file_path)
-            image_urls.append(f"/{UPLOAD_FOLDER}/{unique_filename}")
+        for image_file in image_files:
+            # Streamed to content-addressed storage; the size limit is enforced while copying
+            try:
+                stored = media_store.save(image_file, max_size=MAX_FILE_SIZE)
+            except UploadError as e:
+                logger.error(f"Rejected upload {image_file.filename}: {str(e)}")
+                for previous in stored_images:
+                    media_store.discard(previous)
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e),
+                    'data': None
+                }), 400
+            logger.debug(f"Stored upload as: {stored.url}")
+            stored_images.append(stored)
+            image_urls.append(stored.url)
 
         # Create new comment
         new_comment = Comment(
@@ -197,6 +204,7 @@ def create_comment():
 
         # Save to database
         db.session.add(new_comment)
+        record_comment_rating(hotel_id, rating_point)
         db.session.commit()
 
         # Add images to CommentImages
@@ -220,7 +228,8 @@ def create_comment():
                 'user_id': new_comment.user_id,
                 'hotel_id': new_comment.hotel_id,
                 'created_at': new_comment.created_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                'images': image_urls
+                'images': image_urls,
+                'image_variants': [media_store.variant_urls(url) for url in image_urls]
             }
         }
         logger.info(f"Comment created: {new_comment.id_comment}")
@@ -229,11 +238,9 @@ def create_comment():
     except IntegrityError as e:
         db.session.rollback()
         # Clean up uploaded files on error
-        for image_url in image_urls:
-            file_path = image_url.lstrip('/')
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logger.debug(f"Cleaned up file: {file_path}")
+        for stored in stored_images:
+            media_store.discard(stored)
+            logger.debug(f"Cleaned up file: {stored.url}")
         logger.error(f"Database error: {str(e)}")
         return jsonify({
             'status': 'error',
@@ -243,11 +250,9 @@ def create_comment():
     except Exception as e:
         db.session.rollback()
         # Clean up uploaded files on error
-        for image_url in image_urls:
-            file_path = image_url.lstrip('/')
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logger.debug(f"Cleaned up file: {file_path}")
+        for stored in stored_images:
+            media_store.discard(stored)
+            logger.debug(f"Cleaned up file: {stored.url}")
         logger.error(f"Error creating comment: {str(e)}")
         return jsonify({
             'status': 'error',
@@ -261,42 +266,85 @@ def get_comment_by_hotel_id(hotel_id):
     try:
         sortType = request.args.get('sortType').lower()
 
-        valid_sort_types = {
-            'oldest' : Comment.created_at.asc(),
-            'newest' : Comment.created_at.desc(),
-            'lowest' : Comment.rating_point.asc(),
-            'highest' : Comment.rating_point.desc()
-        }
-
-        if sortType not in valid_sort_types:
+        if sortType not in SORT_KEYS:
             return jsonify({
                 'status' : 'error',
                 'message' : 'Invalid sortType. Valid value: oldest, newest, lowest, highest',
                 'data' : None
             }), 404
-        # Get the authenticated user's email from JWT
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
+
+        # include_hotel=false drops the hotel header. The feed is returned in keyset pages of at
+        # most MAX_COMMENTS_PER_PAGE; follow pagination.next_cursor for the rest
+        include_hotel = request.args.get('include_hotel', 'true').lower() != 'false'
+        cursor = request.args.get('cursor')
+        per_page = request.args.get('per_page', COMMENTS_PER_PAGE, type=int)
+        if request.args.get('paging', '').lower() == 'false':
             return jsonify({
                 'status': 'error',
-                'message': 'User not found',
+                'message': f'paging=false is not supported: comments come in pages of at most '
+                           f'{MAX_COMMENTS_PER_PAGE} (per_page); follow pagination.next_cursor for the rest',
                 'data': None
-            }), 404
+            }), 400
+        if per_page < 1:
+            return jsonify({
+                'status': 'error',
+                'message': 'per_page must be a positive integer',
+                'data': None
+            }), 400
+        per_page = min(per_page, MAX_COMMENTS_PER_PAGE)
 
-        # Fetch all comments for the hotel
-        base_comment = Comment.query.filter_by(hotel_id=hotel_id)
-        ordered_comments = base_comment.order_by(valid_sort_types[sortType])
-        comments = ordered_comments.all()
-        if not comments:
+        # fields=/exclude= choose the comment fields; other columns are deferred and
+        # relationships that are not selected are never loaded
+        try:
+            fields = parse_fieldset(request.args, COMMENT_FIELDS, always=['id_comment'])
+        except InvalidFieldset as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }), 400
+        column_fields = [name for name in fields if name in COMMENT_COLUMN_FIELDS]
+
+        # Users and images are batch-loaded with one IN query each instead of per comment
+        sort_column, descending = SORT_KEYS[sortType]
+        loaded_columns = [COMMENT_COLUMN_FIELDS[name] for name in column_fields] + [sort_column]
+        options = []
+        if 'user' in fields:
+            loaded_columns.append(Comment.user_id)
+            options.append(
+                selectinload(Comment.user).load_only(Users.id, Users.user_name, Users.email, Users.avatar_url)
+            )
+        if 'images' in fields:
+            options.append(selectinload(Comment.images))
+        base_comment = Comment.query.filter_by(hotel_id=hotel_id).options(load_only(*loaded_columns), *options)
+        try:
+            page = keyset_paginate(base_comment, [sort_column, Comment.id_comment], per_page,
+                                   cursor=cursor, descending=descending)
+        except InvalidCursor as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e),
+                'data': None
+            }), 400
+        comments = page.items
+        if not comments and not cursor:
             return jsonify({
                 'status': 'success',
                 'message': 'No comments found for this hotel',
                 'data': None
             }), 200
 
-        hotel = Hotel.query.get(hotel_id)
-        if not hotel:
+        hotel = None
+        if include_hotel:
+            hotel = Hotel.query.options(
+                joinedload(Hotel.location),
+                selectinload(Hotel.facilities),
+                selectinload(Hotel.images)
+            ).get(hotel_id)
+            hotel_exists = hotel is not None
+        else:
+            hotel_exists = db.session.query(Hotel.id).filter_by(id=hotel_id).first() is not None
+        if not hotel_exists:
             return jsonify({
                 'status': 'error',
                 'message': f'Hotel with id {hotel_id} not found',
@@ -305,46 +353,46 @@ def get_comment_by_hotel_id(hotel_id):
 
         comment_list = []
         for comment in comments:
-            user_info = {
-                'id': comment.user.id,
-                'user_name': comment.user.user_name,
-                'email': comment.user.email,
-                'avatar_url': comment.user.avatar_url
-            }
-            comment_data = {
-                'id_comment': comment.id_comment,
-                'rating_point': comment.rating_point,
-                'comment': comment.comment,
-                'user': user_info,
-                'hotel_id': comment.hotel_id,
-                'created_at': comment.created_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
-                'images': [image.image_url for image in comment.images]
-            }
+            comment_data = {name: getattr(comment, name) for name in column_fields}
+            if 'created_at' in comment_data:
+                comment_data['created_at'] = comment.created_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+            if 'user' in fields:
+                comment_data['user'] = {
+                    'id': comment.user.id,
+                    'user_name': comment.user.user_name,
+                    'email': comment.user.email,
+                    'avatar_url': comment.user.avatar_url
+                }
+            if 'images' in fields:
+                comment_data['images'] = [image.image_url for image in comment.images]
+                comment_data['image_variants'] = [media_store.variant_urls(url) for url in comment_data['images']]
             comment_list.append(comment_data)
 
-        # Prepare hotel data
-        hotel_data = {
-            'hotel_name': hotel.hotel_name,
-            'address': hotel.address,
-            'hotel_star': hotel.hotel_star,
-            'hotel_rating': hotel.hotel_rating,
-            'description': hotel.description,
-            'location': {
-                'city': hotel.location.city,
-                'country': hotel.location.country
-            },
-            'facilities': [facility.name for facility in hotel.facilities],
-            'images': [image.image_url for image in hotel.images]
-        }
+        data = {}
+        if include_hotel:
+            # Prepare hotel data
+            data['hotel'] = {
+                'hotel_name': hotel.hotel_name,
+                'address': hotel.address,
+                'hotel_star': hotel.hotel_star,
+                'hotel_rating': hotel.hotel_rating,
+                'description': hotel.description,
+                'location': {
+                    'city': hotel.location.city,
+                    'country': hotel.location.country
+                },
+                'facilities': [facility.name for facility in hotel.facilities],
+                'images': [image.image_url for image in hotel.images]
+            }
+        data['comments'] = comment_list
 
-        return jsonify({
+        response = {
             'status': 'success',
             'message': 'Comments retrieved successfully',
-            'data': {
-                'hotel': hotel_data,
-                'comments': comment_list
-            }
-        }), 200
+            'data': data,
+            'pagination': page.to_dict()
+        }
+        return jsonify(response), 200
 
     except Exception as e:
         logger.error(f"Error fetching comments: {str(e)}")
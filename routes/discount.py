@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models import Hotel_Room, Booking, Users, Hotel, UserDiscount, Discount
+from models import Hotel_Room, Booking, Hotel, UserDiscount, Discount
 from datetime import datetime
 from sqlalchemy import and_, not_
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
+from cache import cached_response
+from identity import current_user_row, user_not_found
 
 
 discount = Blueprint('discount', __name__, url_prefix='/')
@@ -13,10 +15,9 @@ discount = Blueprint('discount', __name__, url_prefix='/')
 @jwt_required()
 def change_discount():
     try:
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({'status': 'error', 'message': 'User not found'}), 404
+        user = current_user_row()
+        if user is None:
+            return user_not_found()
 
         data = request.get_json()
         if not data or 'discount_id' not in data:
@@ -69,10 +70,7 @@ def change_discount():
 @jwt_required()
 def get_user_discounts():
     try:
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({'status': 'error', 'message': 'User not found'}), 404
+        user = current_user
 
         user_discounts = UserDiscount.query.filter_by(user_id=user.id).all()
 
@@ -100,6 +98,7 @@ def get_user_discounts():
 
 
 @discount.route('/all-discounts', methods=['GET'])
+@cached_response
 def get_all_discounts():
     try:
         discounts = Discount.query.all()
@@ -1,16 +1,108 @@
-from flask import Flask, render_template, request, Blueprint
+from flask import Flask, current_app, render_template, request, Blueprint
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from extensions import db
 import sqlite3
+import time
 
 exec_sql_bp = Blueprint('exec_sql', __name__)
 
+# Console queries run once, on a read-only connection, and stream through fetchmany():
+# only the requested page is kept, and SQLite's progress handler aborts anything that
+# runs past the wall-clock budget.
+SQL_PAGE_SIZE = 100
+SQL_TIME_BUDGET = 5.0  # seconds
+FETCH_SIZE = 100
+PROGRESS_STEP = 1000  # VM instructions between progress handler calls
+READ_ONLY_PRAGMAS = {
+    'query_only': 'ON',
+    'busy_timeout': 5000,
+    'cache_size': -16 * 1024,
+    'temp_store': 'MEMORY'
+}
 
-def query_db(query, params=()):
-    conn = sqlite3.connect('instance/hotel.db')
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    results = cursor.fetchall()
-    conn.close()
-    return results
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def read_only_engine():
+    # One small pool of mode=ro connections per app, opened against the app's database file
+    engine = current_app.extensions.get('sql_console_engine')
+    if engine is None:
+        path = db.engine.url.database
+
+        def connect():
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+            for name, value in READ_ONLY_PRAGMAS.items():
+                conn.execute(f'PRAGMA {name}={value}')
+            return conn
+
+        engine = create_engine('sqlite://', creator=connect, poolclass=QueuePool, pool_size=2, max_overflow=2)
+        current_app.extensions['sql_console_engine'] = engine
+    return engine
+
+
+def query_db(query, page=1, page_size=SQL_PAGE_SIZE, budget=None):
+    budget = current_app.config.get('SQL_TIME_BUDGET', SQL_TIME_BUDGET) if budget is None else budget
+    conn = read_only_engine().raw_connection()
+    sqlite_conn = conn.driver_connection
+    started = time.perf_counter()
+    deadline = started + budget
+    progress_calls = 0
+
+    def progress():
+        nonlocal progress_calls
+        progress_calls += 1
+        return 1 if time.perf_counter() > deadline else 0
+
+    sqlite_conn.set_progress_handler(progress, PROGRESS_STEP)
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query)
+        except sqlite3.OperationalError:
+            if time.perf_counter() > deadline:
+                raise QueryBudgetExceeded(f'Query exceeded the {budget:g}s time budget')
+            raise
+        columns = [description[0] for description in cursor.description or []]
+
+        skip = (page - 1) * page_size
+        rows = []
+        rows_read = 0
+        has_next = False
+        try:
+            while not has_next:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    break
+                for row in batch:
+                    if rows_read >= skip + page_size:
+                        has_next = True
+                        break
+                    if rows_read >= skip:
+                        rows.append(row)
+                    rows_read += 1
+        except sqlite3.OperationalError:
+            if time.perf_counter() > deadline:
+                raise QueryBudgetExceeded(f'Query exceeded the {budget:g}s time budget')
+            raise
+        cursor.close()
+    finally:
+        sqlite_conn.set_progress_handler(None, 0)
+        conn.close()
+
+    stats = {
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+        'rows_read': rows_read,
+        'vm_steps': progress_calls * PROGRESS_STEP,
+        'first_row': skip + 1,
+        'last_row': skip + len(rows),
+        'page': page,
+        'has_prev': page > 1,
+        'has_next': has_next
+    }
+    return columns, rows, stats
 
 
 @exec_sql_bp.route('/sql', methods=['GET', 'POST'])
@@ -18,25 +110,22 @@ def index():
     data = []
     columns = []
     error = None
+    stats = None
+    query = ''
 
     if request.method == 'POST':
         try:
             query = request.form['query']
-            results = query_db(query)
-            print(query)
+            page = max(1, request.form.get('page', 1, type=int))
+            columns, results, stats = query_db(query, page)
             if results:
-                conn = sqlite3.connect('instance/hotel.db')
-                cursor = conn.cursor()
-                cursor.execute(query)
-                columns = [description[0] for description in cursor.description]
-                conn.close()
-
                 data = results
             else:
                 error = "None of data return."
 
+        except QueryBudgetExceeded as e:
+            error = f"Error: {str(e)}"
         except sqlite3.Error as e:
             error = f"Error: {str(e)}"
 
-    return render_template('query.html', data=data, columns=columns, error=error)
-
+    return render_template('query.html', data=data, columns=columns, error=error, stats=stats, query=query)
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required
 from models import Hotel_Room, Hotel
 from extensions import db
 from sqlalchemy.orm import joinedload
+from pagination import InvalidCursor, keyset_paginate
 
 hotel_rooms_bp = Blueprint('hotel_rooms', __name__)
 
@@ -21,9 +22,12 @@ def getRoomByHotelId(hotel_id):
             }
             return jsonify(response), 404
 
-        # Get pagination parameters
+        # Get pagination parameters; paging=cursor or a cursor argument switches to keyset pages
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        cursor = request.args.get('cursor')
+        keyset = request.args.get('paging', '').lower() == 'cursor' or cursor is not None
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
 
         if page < 1 or per_page < 1:
             response = {
@@ -39,9 +43,33 @@ def getRoomByHotelId(hotel_id):
             joinedload(Hotel_Room.hotel)
         )
 
-        # Paginate the query
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        rooms = pagination.items
+        if keyset:
+            try:
+                keyset_page = keyset_paginate(query, [Hotel_Room.id_hotel_room], per_page,
+                                              cursor=cursor, with_total=include_total)
+            except InvalidCursor as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e),
+                    'data': [],
+                    'pagination': {}
+                }), 400
+            rooms = keyset_page.items
+            pagination_info = keyset_page.to_dict()
+        else:
+            # Paginate the query
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            rooms = pagination.items
+            pagination_info = {
+                'current_page': pagination.page,
+                'per_page': pagination.per_page,
+                'total_pages': pagination.pages,
+                'total_rooms': pagination.total,
+                'has_prev': pagination.has_prev,
+                'has_next': pagination.has_next,
+                'prev_page': pagination.prev_num,
+                'next_page': pagination.next_num
+            }
 
         # Prepare response data
         result = []
@@ -54,18 +82,6 @@ def getRoomByHotelId(hotel_id):
                 'hotel_name': room.hotel.hotel_name if room.hotel else None
             })
 
-        # Pagination info
-        pagination_info = {
-            'current_page': pagination.page,
-            'per_page': pagination.per_page,
-            'total_pages': pagination.pages,
-            'total_rooms': pagination.total,
-            'has_prev': pagination.has_prev,
-            'has_next': pagination.has_next,
-            'prev_page': pagination.prev_num,
-            'next_page': pagination.next_num
-        }
-
         response = {
             'status': 'success',
             'message': f'Rooms for hotel id {hotel_id} retrieved successfully',
@@ -1,18 +1,35 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
-from models import Hotel, Locations, HotelFacilities, Facilities, Comment
+from models import Hotel, Locations, distance_sort_key
 from extensions import db
-from sqlalchemy import asc, desc, and_, func
-from sqlalchemy.orm import joinedload
+from sqlalchemy import asc, bindparam, desc, and_
+from search import matching_hotel_ids, search_hotels
+from facility_index import facility_index, parse_facility_query
+from pagination import InvalidCursor, keyset_paginate
+from cache import cached_response
+from serializers import HOTEL_FIELDS, InvalidFieldset, hotel_list_query, parse_fieldset, serialize_hotel_rows
 
 hotels_bp = Blueprint('hotels', __name__)
 
-VALID_SORT_FIELDS = ['hotel_name', 'new_price', 'old_price', 'hotel_star', 'hotel_rating']
+VALID_SORT_FIELDS = ['hotel_name', 'new_price', 'old_price', 'hotel_star', 'hotel_rating', 'distance']
+# sort_by name -> column; each has an (id_location, column) index. Distance sorts on
+# models.distance_sort_key rather than the bare column, see sort_key()
+SORT_COLUMNS = {name: getattr(Hotel, name) for name in VALID_SORT_FIELDS if name != 'distance'}
+SORT_COLUMNS['distance'] = Hotel.distance_km
 VALID_SEARCH_FIELDS = ['hotel_name', 'address', 'facilities', 'hotel_star']
+MAX_SEARCH_RESULTS = 100
+
+
+def sort_key(sort_by, descending):
+    # Each key is backed by an index leading with id_location
+    if sort_by == 'distance':
+        return distance_sort_key(descending)
+    return SORT_COLUMNS[sort_by]
 
 
 @hotels_bp.route('/hotels/location/<int:id>', methods=['GET'])
 @jwt_required()
+@cached_response
 def get_hotels_by_location(id):
     try:
         location = Locations.query.get(id)
@@ -26,14 +43,19 @@ def get_hotels_by_location(id):
             return jsonify(response), 404
 
         # Get query parameters
-        paging = request.args.get('paging', 'false').lower() == 'true'
+        # paging=true: page/per_page (offset); paging=cursor or a cursor argument: keyset pages
+        paging_mode = request.args.get('paging', 'false').lower()
+        keyset = paging_mode == 'cursor' or 'cursor' in request.args
+        paging = paging_mode == 'true' and not keyset
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         sort_by = request.args.get('sort_by', default=None)
         sort_order = request.args.get('sort_order', default='asc')
 
         # Validate page and per_page only if paging is enabled
-        if paging and (page < 1 or per_page < 1):
+        if (paging or keyset) and (page < 1 or per_page < 1):
             response = {
                 'status': 'error',
                 'message': 'Page and per_page must be positive integers',
@@ -42,26 +64,34 @@ def get_hotels_by_location(id):
             }
             return jsonify(response), 400
 
-        # Base query
-        query = Hotel.query.filter_by(id_location=id).outerjoin(
-            Comment, Hotel.id == Comment.hotel_id
-        ).group_by(Hotel.id).add_columns(
-            func.avg(Comment.rating_point).label('user_rating')
-        ).options(
-            joinedload(Hotel.facilities),
-            joinedload(Hotel.images),
-            joinedload(Hotel.location)
-        )
+        # fields=/exclude= pick the emitted fields; unselected columns are not read and
+        # unselected images/facilities/location are not loaded
+        try:
+            fields = parse_fieldset(request.args, HOTEL_FIELDS, always=['id'])
+        except InvalidFieldset as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e),
+                'data': [],
+                'pagination': {}
+            }), 400
+
+        descending = sort_order.lower() == 'desc'
+        sort_column = sort_key(sort_by, descending) if sort_by in SORT_COLUMNS else None
+
+        # Base query: a column projection (plus the sort key); collections are batch-loaded per page
+        extra_columns = [sort_column] if sort_column is not None else []
+        query = hotel_list_query(fields, extra_columns).filter(Hotel.id_location == id)
 
         search_conditions = []
-        having_conditions = []
 
         # Filter by fields
         for param, value in request.args.items():
             if param in ['page', 'per_page', 'sort_by', 'sort_order',
                          'hotel_star_min', 'hotel_star_max',
                          'user_rating_min', 'user_rating_max',
-                         'new_price_min', 'new_price_max', 'paging']:
+                         'new_price_min', 'new_price_max', 'distance_max', 'paging', 'cursor', 'include_total',
+                         'fields', 'exclude']:
                 continue
             if param not in VALID_SEARCH_FIELDS:
                 return jsonify({
@@ -82,15 +112,15 @@ def get_hotels_by_location(id):
                         'data': [],
                         'pagination': {}
                     }), 400
+            elif param == 'facilities':
+                # facilities=pool|spa,wifi: bitwise AND/OR over the in-memory facility index.
+                # The ids are inlined so large locations are not bound by SQLite's parameter limit.
+                hotel_ids = facility_index.match(parse_facility_query(value), id_location=id)
+                search_conditions.append(Hotel.id.in_(
+                    bindparam('facility_hotel_ids', hotel_ids, expanding=True, literal_execute=True)))
             else:
-                search_pattern = f'%{value}%'
-                if param == 'hotel_name':
-                    search_conditions.append(Hotel.hotel_name.ilike(search_pattern))
-                elif param == 'address':
-                    search_conditions.append(Hotel.address.ilike(search_pattern))
-                elif param == 'facilities':
-                    query = query.outerjoin(HotelFacilities).outerjoin(Facilities)
-                    search_conditions.append(Facilities.name.ilike(search_pattern))
+                # Accent-insensitive token-prefix match against the FTS index
+                search_conditions.append(Hotel.id.in_(matching_hotel_ids(value, param)))
 
         # Range filter logic
         hotel_star_min = request.args.get('hotel_star_min', type=float)
@@ -99,6 +129,7 @@ def get_hotels_by_location(id):
         user_rating_max = request.args.get('user_rating_max', type=float)
         new_price_min = request.args.get('new_price_min', type=int)
         new_price_max = request.args.get('new_price_max', type=int)
+        distance_max = request.args.get('distance_max', type=float)
 
         if hotel_star_min is not None:
             search_conditions.append(Hotel.hotel_star >= hotel_star_min)
@@ -110,16 +141,16 @@ def get_hotels_by_location(id):
             search_conditions.append(Hotel.new_price <= new_price_max)
 
         if user_rating_min is not None:
-            having_conditions.append(func.avg(Comment.rating_point) >= user_rating_min)
+            search_conditions.append(Hotel.user_rating >= user_rating_min)
         if user_rating_max is not None:
-            having_conditions.append(func.avg(Comment.rating_point) <= user_rating_max)
+            search_conditions.append(Hotel.user_rating <= user_rating_max)
+        # Kilometres to the centre; a range scan on (id_location, distance_km)
+        if distance_max is not None:
+            search_conditions.append(Hotel.distance_km <= distance_max)
 
         if search_conditions:
             query = query.filter(and_(*search_conditions))
 
-        if having_conditions:
-            query = query.having(and_(*having_conditions))
-
         if sort_by:
             if sort_by not in VALID_SORT_FIELDS:
                 return jsonify({
@@ -128,14 +159,28 @@ def get_hotels_by_location(id):
                     'data': [],
                     'pagination': {}
                 }), 400
-            sort_column = getattr(Hotel, sort_by)
-            if sort_order.lower() == 'desc':
+            if descending:
                 query = query.order_by(desc(sort_column))
             else:
                 query = query.order_by(asc(sort_column))
 
         # Conditional pagination
-        if paging:
+        if keyset:
+            # Seeks on (sort column, id) through the (id_location, sort column) indexes
+            columns = [sort_column, Hotel.id] if sort_column is not None else [Hotel.id]
+            try:
+                keyset_page = keyset_paginate(query, columns, per_page, cursor=cursor,
+                                              descending=descending, with_total=include_total)
+            except InvalidCursor as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e),
+                    'data': [],
+                    'pagination': {}
+                }), 400
+            hotels = keyset_page.items
+            pagination_info = keyset_page.to_dict()
+        elif paging:
             pagination = query.paginate(page=page, per_page=per_page, error_out=False)
             hotels = pagination.items
             pagination_info = {
@@ -149,44 +194,12 @@ def get_hotels_by_location(id):
                 'next_page': pagination.next_num
             }
         else:
-            # Count total hotels
-            count_query = Hotel.query.filter_by(id_location=id).outerjoin(
-                Comment, Hotel.id == Comment.hotel_id
-            ).group_by(Hotel.id)
-            if search_conditions:
-                count_query = count_query.filter(and_(*search_conditions))
-            if having_conditions:
-                count_query = count_query.having(and_(*having_conditions))
-            total_hotels = count_query.count()
-
             hotels = query.all()
             pagination_info = {
-                'total_hotels': total_hotels
+                'total_hotels': len(hotels)
             }
 
-        result = []
-        for hotel, user_rating in hotels:
-            result.append({
-                'id': hotel.id,
-                'hotel_name': hotel.hotel_name,
-                'new_price': hotel.new_price,
-                'old_price': hotel.old_price,
-                'hotel_star': hotel.hotel_star,
-                'hotel_rating': hotel.hotel_rating,
-                'user_rating': float(user_rating) if user_rating is not None else None,
-                'address': hotel.address,
-                'image': [image.image_url for image in hotel.images],
-                'policies': hotel.policies,
-                'descriptions': hotel.description,
-                'distance': hotel.distance,
-                'location': {
-                    'id_location': hotel.location.id_location,
-                    'name': hotel.location.name,
-                    'city': hotel.location.city,
-                    'country': hotel.location.country
-                },
-                'facilities': [facility.name for facility in hotel.facilities]
-            })
+        result = serialize_hotel_rows(hotels, location, fields)
 
         response = {
             'status': 'success',
@@ -203,4 +216,51 @@ def get_hotels_by_location(id):
             'data': [],
             'pagination': {}
         }
-        return jsonify(response), 500
\ No newline at end of file
+        return jsonify(response), 500
+
+@hotels_bp.route('/hotels/search', methods=['GET'])
+@jwt_required()
+def search_hotel_catalog():
+    try:
+        q = request.args.get('q', '').strip()
+        id_location = request.args.get('id_location', type=int)
+        limit = request.args.get('limit', 20, type=int)
+
+        if not q:
+            return jsonify({
+                'status': 'error',
+                'message': 'Query parameter q is required',
+                'data': []
+            }), 400
+        if limit < 1:
+            return jsonify({
+                'status': 'error',
+                'message': 'limit must be a positive integer',
+                'data': []
+            }), 400
+
+        results = search_hotels(q, id_location=id_location, limit=min(limit, MAX_SEARCH_RESULTS))
+        data = [{
+            'id': hotel.id,
+            'hotel_name': hotel.hotel_name,
+            'address': hotel.address,
+            'new_price': hotel.new_price,
+            'hotel_star': hotel.hotel_star,
+            'hotel_rating': hotel.hotel_rating,
+            'user_rating': hotel.user_rating,
+            'id_location': hotel.id_location,
+            'score': -score
+        } for hotel, score in results]
+
+        return jsonify({
+            'status': 'success',
+            'message': f'{len(data)} hotels matched',
+            'data': data
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error searching hotels: {str(e)}',
+            'data': []
+        }), 500
@@ -2,10 +2,12 @@ from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required
 from models import Locations
 from extensions import db
+from cache import cached_response
 
 locations_bp = Blueprint('locations', __name__)
 
 @locations_bp.route('api/locations', methods=['GET'])
+@cached_response
 def get_locations():
     try:
         locations = Locations.query.all()
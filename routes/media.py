@@ -0,0 +1,52 @@
+from flask import Blueprint, current_app, jsonify, send_file
+from media import media_store
+from metrics import metrics
+import os
+
+media_bp = Blueprint('media', __name__)
+
+# Stored files are named by their content hash, so a URL always means the same bytes and
+# clients may cache it forever. send_file(conditional=True) answers If-None-Match /
+# If-Modified-Since with 304 and Range with 206, and hands the body to the server's
+# file wrapper (sendfile) or, with USE_X_SENDFILE, to the fronting proxy.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+FALLBACK_MAX_AGE = 60
+
+
+@media_bp.route('/media/<path:name>', methods=['GET'])
+def get_media(name):
+    try:
+        path, exact = media_store.resolve(name)
+        if path is None:
+            metrics.increment('media.misses')
+            return jsonify({
+                'status': 'error',
+                'message': 'Media not found',
+                'data': None
+            }), 404
+
+        response = send_file(
+            os.path.abspath(path),
+            conditional=True,
+            # The content hash (plus variant) already identifies the bytes
+            etag=os.path.splitext(os.path.basename(path))[0],
+            last_modified=os.path.getmtime(path),
+            max_age=IMMUTABLE_MAX_AGE if exact else FALLBACK_MAX_AGE
+        )
+        response.cache_control.public = True
+        if exact:
+            response.cache_control.immutable = True
+        else:
+            # The variant is still rendering; serve the original briefly under the variant's URL
+            metrics.increment('media.variant_fallbacks')
+
+        metrics.increment('media.not_modified' if response.status_code == 304 else 'media.hits')
+        return response
+
+    except Exception as e:
+        current_app.logger.error(f'Error serving media {name}: {str(e)}')
+        return jsonify({
+            'status': 'error',
+            'message': f'Error serving media: {str(e)}',
+            'data': None
+        }), 500
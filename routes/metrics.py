@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+from metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    try:
+        return jsonify({
+            'status': 'success',
+            'message': 'Metrics retrieved successfully',
+            'data': metrics.snapshot()
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error retrieving metrics: {str(e)}',
+            'data': None
+        }), 500
@@ -1,16 +1,15 @@
 from flask import Blueprint, jsonify, request
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
 from extensions import db
 from models import Users
-from werkzeug.utils import secure_filename
+from passwords import PasswordHasherBusy, password_hasher
+from identity import create_user_token, current_user_row, user_not_found
+from media import UploadError, media_store
 import os
 from datetime import datetime
 
 users_bp = Blueprint('users', __name__)
-bcrypt = Bcrypt()
 
-UPLOAD_FOLDER = 'static/uploads/avatars'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
 def allowed_file(filename):
@@ -19,8 +18,6 @@ def allowed_file(filename):
 @users_bp.route('/register', methods=['POST'])
 def register_user():
     try:
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
         if 'user_name' not in request.form or 'email' not in request.form or 'password' not in request.form:
             return jsonify({
                 'status': 'error',
@@ -43,15 +40,15 @@ def register_user():
         if 'avatar' in request.files:
             file = request.files['avatar']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = str(int(os.times().elapsed * 1000))
-                file_ext = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{email}_{timestamp}.{file_ext}"
-                file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                file.save(file_path)
-                avatar_url = f"/{file_path}"
+                try:
+                    avatar_url = media_store.save(file).url
+                except UploadError as e:
+                    return jsonify({
+                        'status': 'error',
+                        'message': str(e)
+                    }), 400
 
-        password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        password_hash = password_hasher.generate(password)
 
         new_user = Users(
             user_name=user_name,
@@ -65,7 +62,7 @@ def register_user():
         db.session.add(new_user)
         db.session.commit()
 
-        access_token = create_access_token(identity=new_user.email)
+        access_token = create_user_token(new_user)
 
         return jsonify({
             'status': 'success',
@@ -78,10 +75,17 @@ def register_user():
                 'country': new_user.country,
                 'point': new_user.point,
                 'avatar_url': new_user.avatar_url,
+                'avatar_variants': media_store.variant_urls(new_user.avatar_url),
                 'access_token': access_token
             }
         }), 201
 
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -109,13 +113,18 @@ def login_user():
             }), 400
 
         user = Users.query.filter_by(email=email).first()
-        if not user or not bcrypt.check_password_hash(user.password, password):
+        if not user or not password_hasher.check(user.password, password):
             return jsonify({
                 'status': 'error',
                 'message': 'Invalid email or password'
             }), 401
 
-        access_token = create_access_token(identity=user.email)
+        # Upgrade hashes made with a different BCRYPT_LOG_ROUNDS while we have the plaintext
+        if password_hasher.needs_rehash(user.password):
+            user.password = password_hasher.generate(password)
+            db.session.commit()
+
+        access_token = create_user_token(user)
 
         return jsonify({
             'status': 'success',
@@ -127,12 +136,19 @@ def login_user():
                 'phone_number': user.phone_number,
                 'country': user.country,
                 'avatar_url': user.avatar_url,
+                'avatar_variants': media_store.variant_urls(user.avatar_url),
                 'point': user.point,
                 'access_token': access_token,
                 'date_of_birth': user.date_of_birth
             }
         }), 200
 
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -143,13 +159,9 @@ def login_user():
 @jwt_required()
 def get_profile():
     try:
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({
-                'status': 'error',
-                'message': 'User not found'
-            }), 404
+        user = current_user_row()
+        if user is None:
+            return user_not_found()
 
         return jsonify({
             'status': 'success',
@@ -161,7 +173,8 @@ def get_profile():
                 'phone_number': user.phone_number,
                 'country': user.country,
                 'point': user.point,
-                'avatar_url': user.avatar_url
+                'avatar_url': user.avatar_url,
+                'avatar_variants': media_store.variant_urls(user.avatar_url)
             }
         }), 200
 
@@ -191,21 +204,17 @@ def change_password():
                 'message': 'Current password and new password are required'
             }), 400
 
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({
-                'status': 'error',
-                'message': 'User not found'
-            }), 404
+        user = current_user_row()
+        if user is None:
+            return user_not_found()
 
-        if not bcrypt.check_password_hash(user.password, current_password):
+        if not password_hasher.check(user.password, current_password):
             return jsonify({
                 'status': 'error',
                 'message': 'Current password is incorrect'
             }), 401
 
-        new_password_hash = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        new_password_hash = password_hasher.generate(new_password)
         user.password = new_password_hash
         db.session.commit()
 
@@ -214,6 +223,12 @@ def change_password():
             'message': 'Password changed successfully'
         }), 200
 
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -225,15 +240,10 @@ def change_password():
 @jwt_required()
 def update_profile():
     try:
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-        email = get_jwt_identity()
-        user = Users.query.filter_by(email=email).first()
-        if not user:
-            return jsonify({
-                'status': 'error',
-                'message': 'User not found'
-            }), 404
+        email = current_user.email
+        user = current_user_row()
+        if user is None:
+            return user_not_found()
 
         user_name = request.form.get('user_name', user.user_name)
         new_email = request.form.get('email', user.email)
@@ -260,15 +270,17 @@ def update_profile():
         if 'avatar' in request.files:
             file = request.files['avatar']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = str(int(os.times().elapsed * 1000))
-                file_ext = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{new_email}_{timestamp}.{file_ext}"  # Use new_email for filename
-                file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                file.save(file_path)
-                avatar_url = f"/{file_path}"
-
-                if user.avatar_url and os.path.exists(user.avatar_url[1:]):
+                try:
+                    avatar_url = media_store.save(file).url
+                except UploadError as e:
+                    return jsonify({
+                        'status': 'error',
+                        'message': str(e)
+                    }), 400
+
+                # Content-addressed files can be shared by other users; only per-user legacy files are removed
+                if (user.avatar_url and avatar_url != user.avatar_url and media_store.parse_url(user.avatar_url) is None
+                        and os.path.exists(user.avatar_url[1:])):
                     os.remove(user.avatar_url[1:])
 
         user.user_name = user_name
@@ -279,7 +291,7 @@ def update_profile():
         user.avatar_url = avatar_url
         db.session.commit()
 
-        access_token = create_access_token(identity=user.email) if new_email != email else None
+        access_token = create_user_token(user) if new_email != email else None
 
         response_data = {
             'status': 'success',
@@ -292,6 +304,7 @@ def update_profile():
                 'country': user.country,
                 'point': user.point,
                 'avatar_url': user.avatar_url,
+                'avatar_variants': media_store.variant_urls(user.avatar_url),
                 'date_of_birth': user.date_of_birth
             }
         }
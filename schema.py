@@ -0,0 +1,54 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from extensions import db
+
+# Indexes older databases may still have that a wider index now covers
+RETIRED_INDEXES = [
+    'ix_Hotel_Room_hotel_id',  # leading column of ix_hotel_room_hotel_type
+]
+
+
+def _column_ddl(column, dialect):
+    ddl = f'"{column.name}" {column.type.compile(dialect=dialect)}'
+    if column.server_default is not None:
+        default = column.server_default.arg
+        ddl += f" DEFAULT {default if not isinstance(default, str) else repr(default)}"
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
+
+
+def upgrade_schema():
+    # db.create_all() skips tables that already exist, so bring older hotel.db files
+    # up to date in place: add missing columns, then any missing indexes, and drop retired ones.
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {_column_ddl(column, conn.dialect)}'))
+                    added.append((table.name, column.name))
+            # table.indexes is a set; a fixed order keeps the file layout reproducible
+            # IF NOT EXISTS rather than checkfirst: reflection does not see expression indexes
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                conn.execute(CreateIndex(index, if_not_exists=True))
+        for name in RETIRED_INDEXES:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    return added
+
+
+def create_schema():
+    # db.create_all() followed by upgrade_schema(), except that create_all() creates each
+    # table's indexes in set order, which changes with hash randomization. Tables are
+    # created bare here and upgrade_schema() adds the indexes in name order, so two
+    # databases built by the same steps are byte-for-byte identical.
+    with db.engine.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing:
+                conn.execute(CreateTable(table))
+    return upgrade_schema()
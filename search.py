@@ -0,0 +1,103 @@
+import re
+import unicodedata
+from sqlalchemy import column, func, literal_column, select, table, text
+from extensions import db
+from models import Facilities, Hotel, HotelFacilities
+
+# FTS5 index over accent-folded hotel text; rowid is Hotel.id
+SEARCH_COLUMNS = ['hotel_name', 'address', 'description', 'facilities']
+SEARCH_WEIGHTS = (10.0, 4.0, 1.0, 2.0)
+
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+
+hotel_search = table('Hotel_Search', column('rowid'), *[column(name) for name in SEARCH_COLUMNS])
+
+
+def fold_text(value):
+    # "Đà Nẵng" -> "da nang": strip combining marks; đ is a base letter so it is mapped explicitly
+    if not value:
+        return ''
+    value = value.replace('đ', 'd').replace('Đ', 'D')
+    return _COMBINING_MARKS.sub('', unicodedata.normalize('NFD', value)).lower()
+
+
+def match_expression(value, field=None):
+    # Every word must appear as a token prefix, optionally inside a single column
+    tokens = re.findall(r'\w+', fold_text(value))
+    if not tokens:
+        return None
+    expression = ' '.join(f'"{token}"*' for token in tokens)
+    return f'{field} : ({expression})' if field else expression
+
+
+def _match(expression):
+    return literal_column('Hotel_Search').op('MATCH')(expression)
+
+
+def matching_hotel_ids(value, field=None):
+    # Subquery of hotel ids for use in Hotel.id.in_(...); matches nothing for an empty query
+    expression = match_expression(value, field)
+    if expression is None:
+        return select(hotel_search.c.rowid).where(text('0'))
+    return select(hotel_search.c.rowid).where(_match(expression))
+
+
+def search_hotels(value, id_location=None, limit=20):
+    expression = match_expression(value)
+    if expression is None:
+        return []
+    score = func.bm25(literal_column('Hotel_Search'), *SEARCH_WEIGHTS).label('score')
+    ranked = select(hotel_search.c.rowid.label('hotel_id'), score).where(_match(expression)).subquery()
+    query = db.session.query(Hotel, ranked.c.score).join(ranked, ranked.c.hotel_id == Hotel.id)
+    if id_location is not None:
+        query = query.filter(Hotel.id_location == id_location)
+    return query.order_by(ranked.c.score, Hotel.id).limit(limit).all()
+
+
+def ensure_search_index():
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS Hotel_Search USING fts5({', '.join(SEARCH_COLUMNS)}, tokenize='unicode61')"
+    ))
+    if db.session.execute(select(hotel_search.c.rowid).limit(1)).first() is None:
+        rebuild_search_index()
+    db.session.commit()
+
+
+def remove_hotels(hotel_ids):
+    hotel_ids = list(hotel_ids)
+    if hotel_ids:
+        db.session.execute(hotel_search.delete().where(hotel_search.c.rowid.in_(hotel_ids)))
+
+
+def index_hotels(hotel_ids=None):
+    # (Re)index the given hotels, or every hotel when hotel_ids is None
+    facility_names = select(
+        HotelFacilities.id_hotel, func.group_concat(Facilities.name, ' ').label('names')
+    ).join(Facilities, Facilities.id_fac == HotelFacilities.id_facilities).group_by(HotelFacilities.id_hotel)
+    query = select(
+        Hotel.id, Hotel.hotel_name, Hotel.address, Hotel.description
+    )
+    if hotel_ids is not None:
+        hotel_ids = list(hotel_ids)
+        if not hotel_ids:
+            return 0
+        remove_hotels(hotel_ids)
+        query = query.where(Hotel.id.in_(hotel_ids))
+        facility_names = facility_names.where(HotelFacilities.id_hotel.in_(hotel_ids))
+    names_by_hotel = dict(db.session.execute(facility_names).all())
+
+    rows = [{
+        'rowid': hotel_id,
+        'hotel_name': fold_text(hotel_name),
+        'address': fold_text(address),
+        'description': fold_text(description),
+        'facilities': fold_text(names_by_hotel.get(hotel_id))
+    } for hotel_id, hotel_name, address, description in db.session.execute(query)]
+    if rows:
+        db.session.execute(hotel_search.insert(), rows)
+    return len(rows)
+
+
+def rebuild_search_index():
+    db.session.execute(hotel_search.delete())
+    return index_hotels()
@@ -0,0 +1,107 @@
+from collections import defaultdict
+
+from extensions import db
+from models import Facilities, Hotel, HotelFacilities, HotelImages
+
+# Row-based serializers for list endpoints: the listing is a column projection and the
+# per-hotel collections are fetched as plain tuples for the whole page, so building the
+# response never hydrates ORM objects or tracks them in the identity map. Sparse
+# fieldsets (?fields= / ?exclude=) narrow both the projection and the collections loaded.
+IN_CHUNK_SIZE = 500
+
+# Hotel list output field -> column; 'id' is always emitted
+HOTEL_COLUMN_FIELDS = {
+    'id': Hotel.id,
+    'hotel_name': Hotel.hotel_name,
+    'new_price': Hotel.new_price,
+    'old_price': Hotel.old_price,
+    'hotel_star': Hotel.hotel_star,
+    'hotel_rating': Hotel.hotel_rating,
+    'user_rating': Hotel.user_rating,
+    'address': Hotel.address,
+    'policies': Hotel.policies,
+    'descriptions': Hotel.description,
+    'distance': Hotel.distance,
+    'distance_km': Hotel.distance_km
+}
+HOTEL_RELATED_FIELDS = ['image', 'location', 'facilities']
+HOTEL_FIELDS = list(HOTEL_COLUMN_FIELDS) + HOTEL_RELATED_FIELDS
+
+
+class InvalidFieldset(ValueError):
+    pass
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def parse_fieldset(args, available, always=()):
+    # Sparse fieldsets from ?fields=a,b or ?exclude=c,d; returns the selected names in `available` order
+    fields, exclude = args.get('fields'), args.get('exclude')
+    if fields is not None and exclude is not None:
+        raise InvalidFieldset('Use either fields or exclude, not both')
+    if fields is None and exclude is None:
+        return list(available)
+    names = _split(fields if fields is not None else exclude)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise InvalidFieldset(f'Unknown fields: {unknown}. Must be among {list(available)}')
+    if fields is not None:
+        return [name for name in available if name in names or name in always]
+    return [name for name in available if name not in names or name in always]
+
+
+def hotel_list_query(fields=HOTEL_FIELDS, extra_columns=()):
+    # Selects only the columns behind `fields` (id first), then any extra columns such as a sort key
+    columns = [HOTEL_COLUMN_FIELDS['id']] + [
+        HOTEL_COLUMN_FIELDS[name] for name in fields if name in HOTEL_COLUMN_FIELDS and name != 'id'
+    ]
+    columns += [column for column in extra_columns if not any(column is c for c in columns)]
+    return db.session.query(*columns)
+
+
+def _grouped(query_for, ids):
+    # hotel id -> [values], querying in chunks to stay under SQLite's bound-parameter limit
+    grouped = defaultdict(list)
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        for hotel_id, value in query_for(ids[start:start + IN_CHUNK_SIZE]):
+            grouped[hotel_id].append(value)
+    return grouped
+
+
+def hotel_image_urls(ids):
+    return _grouped(lambda chunk: db.session.query(HotelImages.hotel_id, HotelImages.image_url).filter(
+        HotelImages.hotel_id.in_(chunk)
+    ).order_by(HotelImages.hotel_id, HotelImages.id), ids)
+
+
+def hotel_facility_names(ids):
+    return _grouped(lambda chunk: db.session.query(HotelFacilities.id_hotel, Facilities.name).join(
+        Facilities, Facilities.id_fac == HotelFacilities.id_facilities
+    ).filter(HotelFacilities.id_hotel.in_(chunk)), ids)
+
+
+def serialize_hotel_rows(rows, location, fields=HOTEL_FIELDS):
+    # rows come from hotel_list_query(fields); every hotel in a location listing shares `location`
+    names = ['id'] + [name for name in fields if name in HOTEL_COLUMN_FIELDS and name != 'id']
+    items = [dict(zip(names, row)) for row in rows]
+    ids = [item['id'] for item in items]
+    if 'image' in fields:
+        images = hotel_image_urls(ids)
+        for item in items:
+            item['image'] = images.get(item['id'], [])
+    if 'facilities' in fields:
+        facilities = hotel_facility_names(ids)
+        for item in items:
+            item['facilities'] = facilities.get(item['id'], [])
+    if 'location' in fields:
+        location_data = {
+            'id_location': location.id_location,
+            'name': location.name,
+            'city': location.city,
+            'country': location.country
+        }
+        for item in items:
+            item['location'] = location_data
+    return items
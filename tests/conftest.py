@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py reads these at import time, so the suite always runs against a throwaway database
+WORKDIR = tempfile.mkdtemp(prefix='hotel_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    from extensions import db
+    from import_data import import_data
+    from schema import upgrade_schema
+    from search import ensure_search_index
+
+    # The crawl in output.json, loaded once for the whole session
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        ensure_search_index()
+        import_data(db, os.path.join(ROOT, 'output.json'))
+    return app
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.test_client()
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from import_data import iter_json_array
+
+DOCUMENTS = [
+    [12345, 67],
+    [1.5e10, -0.25, 3, 40000],
+    [True, False, None, 'chuỗi dài hơn một đoạn', 12345],
+    [{'city': 'Đà Nẵng', 'Hotel': [{'Name': 'A', 'Star': '4'}]}, 987654321, {'city': 'Huế', 'Hotel': []}],
+    [],
+]
+
+
+@pytest.mark.parametrize('items', DOCUMENTS)
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 7, 65536])
+def test_items_crossing_chunk_boundaries(tmp_path, items, chunk_size):
+    path = tmp_path / 'data.json'
+    for separators in ((',', ':'), (', ', ': ')):
+        path.write_text(json.dumps(items, ensure_ascii=False, separators=separators), encoding='utf-8')
+        assert list(iter_json_array(path, chunk_size)) == items
+
+
+@pytest.mark.parametrize('text', ['[1, 2', '{"a": 1}', '[1 2]', '[{"a": }]'])
+def test_malformed_arrays(tmp_path, text):
+    path = tmp_path / 'data.json'
+    path.write_text(text, encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, 2))
@@ -0,0 +1,192 @@
+# Every query the API issues must be served by an index. Each endpoint is driven once
+# through the test client while its SQL is recorded, and EXPLAIN QUERY PLAN is run on
+# every distinct statement with its original parameters. A plan step that walks a whole
+# table or index (`SCAN <table>`) fails the test, so a dropped index or a rewritten
+# query that stops using one is caught.
+import re
+from collections import OrderedDict
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from facility_index import facility_index
+from models import Discount, Hotel, Hotel_Room
+from pagination import encode_cursor
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)\b(?!.*VIRTUAL TABLE)')
+SKIPPED_STATEMENTS = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'CREATE', 'EXPLAIN')
+
+# Full scans that are the point of the query, not a missing index: (endpoint, table) -> reason
+ALLOWED_SCANS = {
+    ('GET api/locations', 'Locations'): 'lists every location',
+    ('GET /all-discounts', 'Discount'): 'lists every discount',
+    ('GET /hotels (admin)', 'Locations'): 'location picker lists every location',
+}
+# Keyset pages on the primary key show up as "SCAN <table>" but stop after LIMIT rows;
+# only the paged table itself is let through, not other tables joined into the statement
+PRIMARY_KEY_PAGE = re.compile(r'ORDER BY "?(\w+)"?\."?(?:id|id_location)"? (?:ASC|DESC)\s+LIMIT', re.IGNORECASE)
+# Unfiltered listings ordered on an expression key must read it in index order, not sort it
+# (with a range filter such as distance_max, sorting the few matching rows is the better plan)
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+INDEX_ORDERED = {
+    'GET /hotels/location (distance)': 'distance_sort',
+    'GET /hotels/location (distance cursor)': 'distance_sort',
+    'GET /hotels/location (distance desc cursor)': 'distance_sort',
+}
+
+# Statuses other than 200; the admin deletes redirect back to their list page
+EXPECTED_STATUS = {
+    'POST /bookings': 201,
+    'POST /bookings/batch': 201,
+    'POST /comments': 201,
+    'GET /users/delete (admin)': 302,
+    'GET /discounts/delete (admin)': 302,
+    'GET /hotels/delete (admin)': 302,
+}
+
+
+def endpoints(token, hotel_id, location_id, room_id, spare):
+    headers = {'Authorization': f'Bearer {token}'}
+    booking = {'room_id': room_id, 'check_in': '2031-01-01', 'check_out': '2031-01-03',
+               'number_of_people': 2, 'number_of_rooms': 1, 'number_of_children': 0}
+    stay = 'check_in=2031-02-01&check_out=2031-02-03'
+    return [
+        ('POST /login', 'post', '/login', {'json': {'email': 'plans@example.com', 'password': 'secret'}}),
+        ('GET /profile', 'get', '/profile', {'headers': headers}),
+        ('PUT /profile', 'put', '/profile', {'data': {'user_name': 'plans'}, 'headers': headers}),
+        ('POST /change-password', 'post', '/change-password',
+         {'json': {'current_password': 'secret', 'new_password': 'secret'}, 'headers': headers}),
+        ('GET api/locations', 'get', '/api/locations', {'headers': headers}),
+        ('GET /hotels/location', 'get', f'/hotels/location/{location_id}', {'headers': headers}),
+        ('GET /hotels/location (paged)', 'get',
+         f'/hotels/location/{location_id}?paging=true&per_page=5&sort_by=new_price', {'headers': headers}),
+        ('GET /hotels/location (cursor)', 'get',
+         f'/hotels/location/{location_id}?paging=cursor&per_page=5&sort_by=hotel_star&sort_order=desc',
+         {'headers': headers}),
+        ('GET /hotels/location (filters)', 'get',
+         f'/hotels/location/{location_id}?hotel_star_min=3&new_price_max=2000000&distance_max=5'
+         f'&sort_by=distance&facilities=wifi|spa&hotel_name=khach san', {'headers': headers}),
+        ('GET /hotels/location (distance)', 'get',
+         f'/hotels/location/{location_id}?sort_by=distance&paging=true&per_page=5', {'headers': headers}),
+        ('GET /hotels/location (distance cursor)', 'get',
+         f'/hotels/location/{location_id}?sort_by=distance&paging=cursor&per_page=5'
+         f'&cursor={encode_cursor([0.5, hotel_id])}', {'headers': headers}),
+        ('GET /hotels/location (distance desc cursor)', 'get',
+         f'/hotels/location/{location_id}?sort_by=distance&sort_order=desc&paging=cursor&per_page=5'
+         f'&cursor={encode_cursor([3.0, hotel_id])}', {'headers': headers}),
+        ('GET /hotels/search', 'get', '/hotels/search?q=da nang&limit=5', {'headers': headers}),
+        ('GET /hotels/<id>/rooms', 'get', f'/hotels/{hotel_id}/rooms', {'headers': headers}),
+        ('GET /available-rooms', 'get', f'/available-rooms?hotel_id={hotel_id}&{stay}&room_type=Standard',
+         {'headers': headers}),
+        ('POST /calculate-price', 'post', '/calculate-price', {'json': booking, 'headers': headers}),
+        ('POST /calculate-price/batch', 'post', '/calculate-price/batch',
+         {'json': {'items': [booking, dict(booking, user_discount_id=1)]}, 'headers': headers}),
+        ('POST /change-discount', 'post', '/change-discount', {'json': {'discount_id': 1}, 'headers': headers}),
+        ('GET /get-discount', 'get', '/get-discount', {'headers': headers}),
+        ('GET /all-discounts', 'get', '/all-discounts', {'headers': headers}),
+        ('POST /bookings', 'post', '/bookings', {'json': dict(booking, user_discount_id=1), 'headers': headers}),
+        ('POST /bookings/batch', 'post', '/bookings/batch',
+         {'json': {'hotel_id': hotel_id, 'room_type': 'Standard', 'count': 2, 'check_in': '2031-03-01',
+                   'check_out': '2031-03-04', 'number_of_people': 2, 'number_of_children': 0},
+          'headers': headers}),
+        ('GET /booking-history', 'get', '/booking-history', {'headers': headers}),
+        ('POST /comments', 'post', '/comments',
+         {'data': {'rating_point': '8', 'hotel_id': str(hotel_id), 'comment': 'ok'}, 'headers': headers}),
+        ('GET /comments/hotel', 'get', f'/comments/hotel/{hotel_id}?sortType=highest', {'headers': headers}),
+        ('GET /comments/hotel (cursor)', 'get', f'/comments/hotel/{hotel_id}?sortType=newest&paging=cursor&per_page=5',
+         {'headers': headers}),
+        ('GET /hotels (admin)', 'get', '/hotels', {}),
+        ('GET /hotels/<id> (admin)', 'get', f'/hotels/{hotel_id}', {}),
+        ('GET /users (admin)', 'get', '/users', {}),
+        ('GET /discounts (admin)', 'get', '/discounts', {}),
+        ('GET /locations (admin)', 'get', '/locations', {}),
+        # Deletes cascade through every child table keyed by the deleted row
+        ('GET /users/delete (admin)', 'get', f'/users/delete/{spare["user_id"]}', {}),
+        ('GET /discounts/delete (admin)', 'get', f'/discounts/delete/{spare["discount_id"]}', {}),
+        ('GET /hotels/delete (admin)', 'get', f'/hotels/delete/{spare["hotel_id"]}', {}),
+    ]
+
+
+def seed(app, client):
+    response = client.post('/register', data={'user_name': 'plans', 'email': 'plans@example.com', 'password': 'secret'})
+    token = response.get_json()['data']['access_token']
+    response = client.post('/register', data={'user_name': 'spare', 'email': 'spare@example.com', 'password': 'secret'})
+    spare = {'user_id': response.get_json()['data']['id']}
+    with app.app_context():
+        hotel_id, location_id = db.session.execute(db.text('SELECT id, id_location FROM Hotel ORDER BY id LIMIT 1')).one()
+        rooms = [Hotel_Room(room_number=str(100 + n), room_type='Standard', hotel_id=hotel_id) for n in range(4)]
+        discounts = [Discount(discount_name=name, description='', point_required=0, discount_value=10)
+                     for name in ('Plans', 'Spare')]
+        db.session.add_all(rooms + discounts)
+        db.session.commit()
+        room_id = rooms[0].id_hotel_room
+        spare['discount_id'] = discounts[1].id
+        spare['hotel_id'] = db.session.query(db.func.max(Hotel.id)).scalar()
+        # The facility index is loaded once per process, not per request
+        facility_index.rebuild()
+    return token, hotel_id, location_id, room_id, spare
+
+
+def explain(connection, statement, parameters):
+    cursor = connection.cursor()
+    try:
+        return [row[3] for row in cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters or ())]
+    finally:
+        cursor.close()
+
+
+def full_scans(name, statement, plan):
+    paged = PRIMARY_KEY_PAGE.search(statement)
+    scans = []
+    for step in plan:
+        match = FULL_SCAN.match(step)
+        if match is None or (name, match.group(1)) in ALLOWED_SCANS:
+            continue
+        if paged and match.group(1) == paged.group(1):
+            continue
+        scans.append(step)
+    if name in INDEX_ORDERED and INDEX_ORDERED[name] in statement:
+        scans += [step for step in plan if TEMP_SORT in step]
+    return scans
+
+
+@pytest.fixture(scope='module')
+def cases(app, client):
+    return endpoints(*seed(app, client))
+
+
+def test_endpoints_use_indexed_plans(app, client, cases):
+    with app.app_context():
+        engine = db.engine
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(SKIPPED_STATEMENTS):
+            recorded.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    failures = []
+    connection = engine.raw_connection()
+    try:
+        for name, method, url, kwargs in cases:
+            recorded.clear()
+            response = getattr(client, method)(url, **kwargs)
+            # An endpoint that rejects its request never runs the queries it is here to plan
+            expected = EXPECTED_STATUS.get(name, 200)
+            if response.status_code != expected:
+                failures.append(f'{name}: HTTP {response.status_code}, expected {expected}: '
+                                f'{response.get_data(as_text=True)[:200]}')
+                continue
+            statements = OrderedDict((statement, parameters) for statement, parameters in recorded)
+            for statement, parameters in statements.items():
+                plan = explain(connection, statement, parameters)
+                scans = full_scans(name, statement, plan)
+                if scans:
+                    failures.append(f"{name}: {' '.join(statement.split())[:300]}\n" +
+                                    '\n'.join(f"    {'FLAGGED ' if step in scans else ''}{step}" for step in plan))
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+        connection.close()
+
+    assert not failures, '\n'.join(failures)